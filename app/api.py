@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 
@@ -8,8 +9,14 @@ from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
 
+from app.auth.hash import hasher
 from app.config import ClientAPISettings, client_api_settings
 from app.core import CommonException, InternalServerError, MongoManager, Redis
+from app.core.blobs import blob_collector
+from app.core.cascade import cascade_worker
+from app.core.comments import comment_authors
+from app.core.live import live_hub
+from app.core.thumbnails import thumbnails
 from app.routers import list_of_routes
 from app.schemas import __beanie_models__
 
@@ -54,12 +61,21 @@ async def startup() -> None:
     session = MongoManager().get_async_client()
     await init_beanie(database=session.jira, document_models=__beanie_models__)
     await Redis.connect_redis()
+    app.state.background_tasks = [
+        asyncio.create_task(blob_collector.run()),
+        asyncio.create_task(live_hub.run()),
+        asyncio.create_task(cascade_worker.run()),
+        asyncio.create_task(comment_authors.backfill()),
+    ]
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
-    await logger.shutdown()
+    for task in app.state.background_tasks:
+        task.cancel()
     await Redis.disconnect_redis()
+    hasher.shutdown()
+    thumbnails.shutdown()
 
 
 @app.middleware("http")
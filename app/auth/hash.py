@@ -1,11 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config import hash_settings
+from app.core.exceptions import ServiceUnavailable
+
+# min/max совпадают с default, чтобы хеши с другой стоимостью перехешировались при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=hash_settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=hash_settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=hash_settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated thread pool so that hashing does not block the event loop.
+    The number of in-flight and queued jobs is bounded; extra requests get 503.
+    """
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=hash_settings.HASH_WORKERS, thread_name_prefix="bcrypt")
+        self.limit = hash_settings.HASH_WORKERS + hash_settings.HASH_QUEUE_SIZE
+        self.pending = 0
+
+    async def _run(self, func: Callable, *args):
+        if self.pending >= self.limit:
+            raise ServiceUnavailable("Сервис перегружен, попробуйте позже")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
 
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Returns whether the password matches and a new hash if the stored one violates the current policy."""
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
 
-def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+hasher = PasswordHasher()
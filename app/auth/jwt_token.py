@@ -11,9 +11,10 @@ from app.schemas.models.auth import TokenData
 
 def create_access_token(data: TokenData) -> str:
     expire = datetime.utcnow() + timedelta(seconds=client_api_settings.ACCESS_TOKEN_EXPIRE_SECONDS)
-    data.exp = expire
+    payload = data.model_dump(mode="json", exclude_none=True, exclude={"exp"})
+    payload["exp"] = expire
     encoded_jwt = jwt.encode(
-        dict(data),
+        payload,
         key=client_api_settings.AUTH_SECRET,
         algorithm=client_api_settings.AUTH_ALGORITHM,
     )
@@ -22,9 +23,10 @@ def create_access_token(data: TokenData) -> str:
 
 def create_refresh_token(data: TokenData) -> str:
     expire = datetime.utcnow() + timedelta(seconds=client_api_settings.REFRESH_TOKEN_EXPIRE_SECONDS)
-    data.exp = expire
+    payload = data.model_dump(mode="json", exclude_none=True, exclude={"exp"})
+    payload["exp"] = expire
     encoded_jwt = jwt.encode(
-        dict(data),
+        payload,
         key=client_api_settings.AUTH_SECRET,
         algorithm=client_api_settings.AUTH_ALGORITHM,
     )
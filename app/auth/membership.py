@@ -0,0 +1,115 @@
+import json
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from pymongo import ReturnDocument
+
+from app.config import cache_settings
+from app.core.autocomplete import member_directory
+from app.core.cache import LRUCache
+from app.core.redis_session import Redis
+from app.schemas.documents import User, UserAssignedWorkplace
+from app.schemas.models.auth import CacheStats
+from app.schemas.types import Role
+
+
+def build_membership(user_id: UUID, workplace_id: UUID, membership_id: UUID, role: Role) -> UserAssignedWorkplace:
+    """Builds a membership document from already known ids without touching the database."""
+    return UserAssignedWorkplace(
+        id=membership_id,
+        user=User.link_from_id(user_id),
+        role=role,
+        workplace_id=workplace_id,
+    )
+
+
+class MembershipCache:
+    """
+    Resolves the membership of a user in a workplace through two cache levels:
+    a short-lived in-process LRU and a shared Redis tier in front of MongoDB.
+    """
+
+    def __init__(self) -> None:
+        self.local = LRUCache(cache_settings.MEMBERSHIP_CACHE_SIZE, cache_settings.MEMBERSHIP_CACHE_LOCAL_TTL)
+        self.redis = Redis()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: UUID, workplace_id: UUID) -> Optional[UserAssignedWorkplace]:
+        key = (user_id, workplace_id)
+        cached = self.local.get(key)
+        if cached is not None:
+            self.local_hits += 1
+            return build_membership(user_id, workplace_id, UUID(cached["id"]), cached["role"])
+
+        raw = await self.redis.get_membership(str(user_id), str(workplace_id))
+        if raw is not None:
+            self.redis_hits += 1
+            cached = json.loads(raw)
+            self.local.set(key, cached)
+            return build_membership(user_id, workplace_id, UUID(cached["id"]), cached["role"])
+
+        self.misses += 1
+        user_assigned = await UserAssignedWorkplace.find_one(
+            UserAssignedWorkplace.user.id == user_id,
+            UserAssignedWorkplace.workplace_id == workplace_id,
+        )
+        if user_assigned is None:
+            return None
+        cached = {"id": str(user_assigned.id), "role": user_assigned.role}
+        self.local.set(key, cached)
+        await self.redis.set_membership(str(user_id), str(workplace_id), json.dumps(cached))
+        return user_assigned
+
+    async def invalidate(self, user_id: UUID, workplace_id: UUID) -> None:
+        self.invalidations += 1
+        self.local.pop((user_id, workplace_id))
+        await self.redis.delete_membership(str(user_id), str(workplace_id))
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self.local),
+            local_hits=self.local_hits,
+            redis_hits=self.redis_hits,
+            misses=self.misses,
+            invalidations=self.invalidations,
+        )
+
+
+membership_cache = MembershipCache()
+
+
+async def collect_roles(user_id: UUID) -> Dict[UUID, Tuple[UUID, Role]]:
+    """Role map embedded into access tokens: workplace_id -> (membership id, role)."""
+    memberships = await UserAssignedWorkplace.find(UserAssignedWorkplace.user.id == user_id).to_list()
+    return {m.workplace_id: (m.id, m.role) for m in memberships}
+
+
+async def user_workplace_roles(user_id: UUID) -> Dict[UUID, Role]:
+    """Workplaces of the user with their roles, cached in Redis until the user's membership changes."""
+    redis = Redis()
+    raw = await redis.get_user_workplaces(str(user_id))
+    if raw is not None:
+        return {UUID(workplace_id): Role(role) for workplace_id, role in json.loads(raw).items()}
+    roles = {workplace_id: role for workplace_id, (_, role) in (await collect_roles(user_id)).items()}
+    await redis.set_user_workplaces(str(user_id), json.dumps({str(k): v for k, v in roles.items()}))
+    return roles
+
+
+async def invalidate_membership(user_id: UUID, workplace_id: UUID) -> None:
+    """Must be called after any change of the user's membership in the workplace."""
+    await membership_cache.invalidate(user_id, workplace_id)
+    # роли в уже выданных токенах больше не доверяем
+    user = await User.get_motor_collection().find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    # новая версия записывается, а не удаляется: иначе читатель может вернуть в кэш старую
+    if user is not None:
+        await Redis().raise_token_version(str(user_id), user["token_version"])
+    await Redis().delete_user_workplaces(str(user_id))
+    await member_directory.refresh(user_id, workplace_id)
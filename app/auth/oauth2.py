@@ -1,19 +1,66 @@
-from typing import List
+import secrets
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import Depends, Path
-from fastapi.security import HTTPBearer
+from fastapi import Depends, Header, Path, Query
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.requests import HTTPConnection
 
 from app.auth.jwt_token import decode_token
+from app.auth.membership import build_membership, membership_cache
+from app.config import client_api_settings
 from app.core.exceptions import ForbiddenException, Unauthorized, WorkplaceNotFoundError
+from app.core.redis_session import Redis
 from app.schemas.documents import Role, User, UserAssignedWorkplace
+from app.schemas.models.auth import TokenData
 
 oauth2_scheme = HTTPBearer()
 
 
-async def get_current_user(token: UUID = Depends(oauth2_scheme)) -> str:
-    token = decode_token(token.credentials)
-    user = await User.by_email(token.email)
+async def get_token_data(token: HTTPAuthorizationCredentials = Depends(oauth2_scheme)) -> TokenData:
+    return await verify_token(token.credentials)
+
+
+async def get_connection_token_data(
+    connection: HTTPConnection, token: Optional[str] = Query(default=None)
+) -> TokenData:
+    """For WebSocket and EventSource clients, which cannot send headers: the token may come in the query."""
+    scheme, _, credentials = connection.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        credentials = token
+    if not credentials:
+        raise Unauthorized()
+    return await verify_token(credentials)
+
+
+async def verify_token(credentials: str) -> TokenData:
+    """
+    Decodes the token and checks its version against Redis. MongoDB is only read when the version
+    is not cached. If the version changed, the role map from the token is dropped.
+    """
+    token_data = decode_token(credentials)
+    # токены старого формата содержат только email
+    if token_data.id is None:
+        user = await User.by_email(token_data.email)
+        if not user:
+            raise Unauthorized()
+        return TokenData(email=user.email, id=user.id, ver=user.token_version)
+
+    redis = Redis()
+    version = await redis.get_token_version(str(token_data.id))
+    if version is None:
+        user = await User.get(token_data.id)
+        if not user:
+            raise Unauthorized()
+        version = user.token_version
+        await redis.set_token_version(str(user.id), version)
+    if int(version) != token_data.ver:
+        token_data.roles = None
+    return token_data
+
+
+async def get_current_user(token_data: TokenData = Depends(get_token_data)) -> User:
+    user = await User.get(token_data.id)
     if not user:
         raise Unauthorized()
     return user
@@ -23,12 +70,14 @@ class RoleChecker:
     def __init__(self, role: List[Role]):
         self.role = role
 
-    async def __call__(self, user: User = Depends(get_current_user), workplace_id: UUID = Path(...)) -> str:
-        user_assigned = await UserAssignedWorkplace.find(
-            UserAssignedWorkplace.user.id == user.id,
-            UserAssignedWorkplace.workplace.id == workplace_id,
-            fetch_links=True,
-        ).first_or_none()
+    async def __call__(
+        self, token_data: TokenData = Depends(get_token_data), workplace_id: UUID = Path(...)
+    ) -> UserAssignedWorkplace:
+        if token_data.roles is not None and workplace_id in token_data.roles:
+            membership_id, role = token_data.roles[workplace_id]
+            user_assigned = build_membership(token_data.id, workplace_id, membership_id, role)
+        else:
+            user_assigned = await membership_cache.get(token_data.id, workplace_id)
         if not user_assigned:
             raise WorkplaceNotFoundError("Worplace не найден")
         if user_assigned.role in self.role:
@@ -36,9 +85,25 @@ class RoleChecker:
         raise ForbiddenException("Нет прав.")
 
 
+class ConnectionRoleChecker(RoleChecker):
+    async def __call__(
+        self, token_data: TokenData = Depends(get_connection_token_data), workplace_id: UUID = Path(...)
+    ) -> UserAssignedWorkplace:
+        return await super().__call__(token_data, workplace_id)
+
+
 # доступно только админу
 admin: RoleChecker = RoleChecker([Role.ADMIN])
 # доступно админам и членам
 member: RoleChecker = RoleChecker([Role.MEMBER, Role.ADMIN])
 # доступно админам, членам и гостям
 guest: RoleChecker = RoleChecker([Role.GUEST, Role.MEMBER, Role.ADMIN])
+# то же для соединений, которые передают токен в query
+connection_guest: ConnectionRoleChecker = ConnectionRoleChecker([Role.GUEST, Role.MEMBER, Role.ADMIN])
+
+
+async def operator(x_internal_token: Optional[str] = Header(default=None)) -> None:
+    """Guards service endpoints that expose state of the whole process rather than of one workplace."""
+    expected = client_api_settings.INTERNAL_API_TOKEN
+    if not expected or x_internal_token is None or not secrets.compare_digest(x_internal_token, expected):
+        raise ForbiddenException("Нет доступа")
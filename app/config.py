@@ -1,11 +1,16 @@
+import os
+import socket
 from datetime import timedelta
+from typing import List, Optional
 
-from pydantic import MongoDsn, RedisDsn
+from pydantic import Field, MongoDsn, RedisDsn
 from pydantic_settings import BaseSettings
 
 
 class MongoDsnSettings(BaseSettings):
     MONGO_URL: MongoDsn = "mongodb://localhost:27017"
+    # транзакции требуют replica set; на одиночном mongod их можно отключить
+    MONGO_TRANSACTIONS: bool = True
 
     class Config:
         env_file = ".env"
@@ -30,8 +35,10 @@ class ClientAPISettings(BaseSettings):
     APP_PORT: int = 8080
     AUTH_SECRET: str
     AUTH_ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_SECONDS: int = timedelta(hours=1).seconds
-    REFRESH_TOKEN_EXPIRE_SECONDS: int = timedelta(weeks=1).seconds
+    ACCESS_TOKEN_EXPIRE_SECONDS: int = int(timedelta(hours=1).total_seconds())
+    REFRESH_TOKEN_EXPIRE_SECONDS: int = int(timedelta(weeks=1).total_seconds())
+    # служебные эндпоинты /internal доступны только с этим токеном, без него они отключены
+    INTERNAL_API_TOKEN: Optional[str] = None
 
     SERVER_PORT: int = 8000
     SERVER_HOST: str = "0.0.0.0"
@@ -47,9 +54,26 @@ class EmailSettings(BaseSettings):
     EMAIL_USERNAME: str
     EMAIL_PASSWORD: str
     EMAIL_FROM: str
+    EMAIL_SSL_TLS: bool = True
+    EMAIL_STARTTLS: bool = False
+    EMAIL_USE_CREDENTIALS: bool = True
+    EMAIL_VALIDATE_CERTS: bool = True
 
     TTL: int = 5 * 60
 
+    # воркер очереди писем; по умолчанию у каждого процесса свой идентификатор
+    MAIL_WORKER_ID: str = Field(default_factory=lambda: f"{socket.gethostname()}-{os.getpid()}")
+    # письма воркера, переставшего отмечаться дольше этого срока, возвращаются в очередь
+    MAIL_WORKER_TIMEOUT: float = 10 * 60
+    MAIL_POOL_SIZE: int = 4
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_POLL_TIMEOUT: float = 5
+    MAIL_SEND_TIMEOUT: float = 30
+    MAIL_MAX_ATTEMPTS: int = 8
+    MAIL_RETRY_DELAY: float = 30
+    MAIL_RETRY_MAX_DELAY: float = 60 * 60
+    MAIL_DEAD_LETTER_SIZE: int = 10_000
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -58,6 +82,109 @@ class EmailSettings(BaseSettings):
 class AvatarSettings(BaseSettings):
     AVATAR_SIZE: int
     BACKGROUND_COLOR: str
+    AVATAR_CACHE_SIZE: int = 1024
+    # доступные размеры аватарок, каждый должен быть кратен 12
+    AVATAR_SIZES: List[int] = [48, 96, 192, 384]
+    AVATAR_MAX_AGE: int = int(timedelta(days=365).total_seconds())
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class FileSettings(BaseSettings):
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MAX_FILE_SIZE: int = 200 * 1024 * 1024
+    MAX_WORKPLACE_STORAGE: int = 5 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_TTL: int = 24 * 60 * 60
+    UPLOAD_LOCK_TTL: int = 10 * 60
+    BLOB_GC_INTERVAL: int = 60 * 60
+    # файлы, на которые ещё не успели сослаться из задачи или комментария, не трогаем
+    BLOB_GC_GRACE: int = 24 * 60 * 60
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class ThumbnailSettings(BaseSettings):
+    THUMBNAIL_SIZES: List[int] = [128, 256, 512]
+    # WEBP или JPEG
+    THUMBNAIL_FORMAT: str = "WEBP"
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_WORKERS: int = 2
+    THUMBNAIL_JOB_TTL: int = 10 * 60
+    # после ошибки генерации столько секунд отдаётся оригинал без новой попытки
+    THUMBNAIL_FAILURE_TTL: int = 5 * 60
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class SearchSettings(BaseSettings):
+    # сколько лучших совпадений по задачам и по комментариям сравнивается при ранжировании
+    SEARCH_WINDOW: int = 1000
+    SEARCH_COMMENT_WEIGHT: float = 0.5
+    SEARCH_LANGUAGE: str = "russian"
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class HashSettings(BaseSettings):
+    BCRYPT_ROUNDS: int = 12
+    HASH_WORKERS: int = 4
+    # сколько задач хеширования может ждать свободного потока, дальше отвечаем 503
+    HASH_QUEUE_SIZE: int = 32
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class CacheSettings(BaseSettings):
+    MEMBERSHIP_CACHE_SIZE: int = 10_000
+    # локальный уровень живёт недолго: другие воркеры не получают инвалидацию
+    MEMBERSHIP_CACHE_LOCAL_TTL: int = 5
+    MEMBERSHIP_CACHE_TTL: int = 5 * 60
+    TOKEN_VERSION_TTL: int = 24 * 60 * 60
+    USER_WORKPLACES_CACHE_TTL: int = 5 * 60
+    # заполнение снимков авторов у старых комментариев
+    AUTHOR_BACKFILL_BATCH: int = 500
+    AUTHOR_BACKFILL_LOCK_TTL: int = 10 * 60
+    AUTOCOMPLETE_LIMIT: int = 10
+    AUTOCOMPLETE_REBUILD_LOCK_TTL: int = 30
+    DELETED_SPRINTS_CACHE_TTL: int = 60
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class LiveSettings(BaseSettings):
+    # очередь на одно соединение; не успевающий клиент отключается и делает полную синхронизацию
+    LIVE_QUEUE_SIZE: int = 256
+    LIVE_SEND_TIMEOUT: float = 5
+    LIVE_HEARTBEAT: float = 15
+    LIVE_RECONNECT_DELAY: float = 1
+    # номер изменения, чья запись так и не завершилась, перестаёт задерживать ленту синхронизации
+    SYNC_PENDING_TTL: int = 60
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class CascadeSettings(BaseSettings):
+    CASCADE_BATCH_SIZE: int = 500
+    # сколько документов в секунду удаляет один воркер
+    CASCADE_RATE: int = 2000
+    # задачу упавшего воркера подхватывает другой после истечения аренды
+    CASCADE_LEASE: int = 60
+    CASCADE_POLL_INTERVAL: int = 30
+    CASCADE_MAX_ATTEMPTS: int = 5
 
     class Config:
         env_file = ".env"
@@ -69,5 +196,12 @@ mongo_settings = MongoDsnSettings(extra="ignore")
 redis_settings = RedisSettings(extra="ignore")
 email_settings = EmailSettings()
 avatar_settings = AvatarSettings()
+file_settings = FileSettings()
+thumbnail_settings = ThumbnailSettings()
+search_settings = SearchSettings()
+hash_settings = HashSettings()
+cache_settings = CacheSettings()
+live_settings = LiveSettings()
+cascade_settings = CascadeSettings()
 
 # TODO: сделать получение настроек через DI
@@ -3,13 +3,20 @@ from .exceptions import (
     BadRequest,
     CommentNotFoundError,
     CommonException,
+    ConflictException,
     DoNotUsuRefreshToken,
     EmailVerificationException,
+    FileTooLargeException,
+    ForeignMemberError,
     InternalServerError,
     IssueNotFoundError,
+    JobNotFoundError,
+    MemberNotFoundError,
     NoRefreshToken,
     NotFoundException,
+    RangeNotSatisfiableException,
     SprintNotFoundError,
+    UploadSessionNotFoundError,
     UserNotFoundError,
     ValidationError,
     WorkplaceFileNotFoundException,
@@ -36,4 +43,11 @@ __all__ = [
     "CommentNotFoundError",
     "WorkplaceFileNotFoundException",
     "AvatarSizeNotCorrectException",
+    "FileTooLargeException",
+    "ConflictException",
+    "UploadSessionNotFoundError",
+    "RangeNotSatisfiableException",
+    "MemberNotFoundError",
+    "ForeignMemberError",
+    "JobNotFoundError",
 ]
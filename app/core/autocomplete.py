@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from beanie.operators import In
+
+from app.config import cache_settings
+from app.core.redis_session import Redis
+from app.schemas.documents import User, UserAssignedWorkplace
+from app.schemas.models.responses import MemberUser, WorkplaceMember
+
+# отделяет нормализованный термин от id пользователя внутри элемента sorted set
+SEPARATOR = "\x00"
+# больше любого символа в UTF-8, ограничивает диапазон ZRANGEBYLEX сверху
+UPPER_BOUND = "\U0010ffff"
+
+
+def normalize(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+class MemberDirectory:
+    """
+    Per-workplace typeahead index in Redis. Every member has lexicographically ordered
+    terms (full name, each word of the name and e-mail) in a sorted set with equal
+    scores, so a prefix lookup is a single ZRANGEBYLEX. Member cards live in a hash.
+    The index is rebuilt from MongoDB on cold start; while another worker is
+    rebuilding it, requests are answered from MongoDB directly.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis()
+
+    @staticmethod
+    def terms(member: WorkplaceMember) -> List[str]:
+        name = normalize(member.user.name)
+        words = {name, *name.split(" ")}
+        terms = [f"n:{word}{SEPARATOR}{member.user.id}" for word in words if word]
+        terms.append(f"e:{normalize(member.user.email)}{SEPARATOR}{member.user.id}")
+        return terms
+
+    @staticmethod
+    def matches(member: WorkplaceMember, prefix: str) -> bool:
+        name = normalize(member.user.name)
+        candidates = [name, *name.split(" "), normalize(member.user.email)]
+        return any(candidate.startswith(prefix) for candidate in candidates)
+
+    async def _load(self, workplace_id: UUID) -> List[WorkplaceMember]:
+        memberships = await UserAssignedWorkplace.find(UserAssignedWorkplace.workplace_id == workplace_id).to_list()
+        users = await User.find(In(User.id, [m.user.ref.id for m in memberships])).to_list()
+        users = {user.id: user for user in users}
+        return [
+            WorkplaceMember(
+                id=membership.id,
+                role=membership.role,
+                user=MemberUser.model_validate(users[membership.user.ref.id].model_dump()),
+            )
+            for membership in memberships
+            if membership.user.ref.id in users
+        ]
+
+    async def rebuild(self, workplace_id: UUID) -> List[WorkplaceMember]:
+        # версия читается до загрузки: если участник изменился во время перестроения,
+        # индекс не помечается готовым и перестраивается следующим запросом
+        version = await self.redis.get_member_index_version(str(workplace_id))
+        members = await self._load(workplace_id)
+        terms = [term for member in members for term in self.terms(member)]
+        cards = {str(member.user.id): member.model_dump_json() for member in members}
+        await self.redis.replace_member_index(str(workplace_id), terms, cards, version)
+        return members
+
+    async def _ensure(self, workplace_id: UUID) -> Optional[List[WorkplaceMember]]:
+        """Returns members loaded from MongoDB when the Redis index is not ready yet."""
+        if await self.redis.is_member_index_ready(str(workplace_id)):
+            return None
+        lock = f"members:{workplace_id}"
+        token = await self.redis.acquire_lock(lock, cache_settings.AUTOCOMPLETE_REBUILD_LOCK_TTL)
+        if token is None:
+            return await self._load(workplace_id)
+        try:
+            return await self.rebuild(workplace_id)
+        finally:
+            await self.redis.release_lock(lock, token)
+
+    async def search(self, workplace_id: UUID, prefix: str = "", limit: Optional[int] = None) -> List[WorkplaceMember]:
+        prefix = normalize(prefix)
+        cold = await self._ensure(workplace_id)
+        if cold is not None:
+            members = [member for member in cold if self.matches(member, prefix)]
+            members.sort(key=lambda member: normalize(member.user.name))
+            return members[:limit]
+
+        if not prefix:
+            cards = await self.redis.get_members(str(workplace_id))
+            members = sorted(
+                (WorkplaceMember.model_validate_json(card) for card in cards),
+                key=lambda member: normalize(member.user.name),
+            )
+            return members[:limit]
+
+        ranges = [(f"[{kind}:{prefix}", f"[{kind}:{prefix}{UPPER_BOUND}") for kind in ("n", "e")]
+        # у одного участника несколько терминов, поэтому диапазоны читаются порциями,
+        # пока не наберётся limit разных участников или совпадения не закончатся
+        batch = limit * 4 if limit is not None else None
+        offset = 0
+        user_ids: Dict[str, None] = {}
+        while True:
+            found = await self.redis.range_member_terms(str(workplace_id), ranges, batch, offset)
+            for terms in found:
+                for term in terms:
+                    user_ids.setdefault(term.rsplit(SEPARATOR, 1)[1])
+            if batch is None or len(user_ids) >= limit or all(len(terms) < batch for terms in found):
+                break
+            offset += batch
+        cards = await self.redis.get_members(str(workplace_id), list(user_ids)[:limit])
+        return [WorkplaceMember.model_validate_json(card) for card in cards if card is not None]
+
+    async def refresh(self, user_id: UUID, workplace_id: UUID) -> None:
+        """Re-reads a single member; called on join, leave and role change."""
+        # перестроение, начатое до изменения, не пометит индекс готовым
+        await self.redis.raise_member_index_version(str(workplace_id))
+        if not await self.redis.is_member_index_ready(str(workplace_id)):
+            return
+        previous = await self.redis.get_member(str(workplace_id), str(user_id))
+        if previous is not None:
+            member = WorkplaceMember.model_validate_json(previous)
+            await self.redis.delete_member(str(workplace_id), str(user_id), self.terms(member))
+        membership = await UserAssignedWorkplace.find_one(
+            UserAssignedWorkplace.user.id == user_id, UserAssignedWorkplace.workplace_id == workplace_id
+        )
+        user = await User.get(user_id)
+        if membership is None or user is None:
+            return
+        member = WorkplaceMember(
+            id=membership.id, role=membership.role, user=MemberUser.model_validate(user.model_dump())
+        )
+        await self.redis.set_member(str(workplace_id), str(user_id), self.terms(member), member.model_dump_json())
+
+    async def refresh_user(self, user_id: UUID) -> None:
+        """Re-indexes the user in every workplace after a profile change."""
+        memberships = await UserAssignedWorkplace.find(UserAssignedWorkplace.user.id == user_id).to_list()
+        for membership in memberships:
+            await self.refresh(user_id, membership.workplace_id)
+
+    async def drop(self, workplace_id: UUID) -> None:
+        await self.redis.delete_member_index(str(workplace_id))
+
+
+member_directory = MemberDirectory()
@@ -1,12 +1,19 @@
+import asyncio
+import os
 import pathlib
 from hashlib import md5
-from os import makedirs
+from io import BytesIO
+from typing import Optional
+from uuid import uuid4
 
-from numpy import array, concatenate
-from PIL import Image, ImageDraw
+import numpy as np
+from fastapi import Request, Response, status
+from PIL import Image, ImageColor
 
 from app.config import avatar_settings
+from app.core.cache import LRUCache
 from app.core.exceptions import AvatarSizeNotCorrectException
+from app.core.storage import get_avatar_storage
 
 
 class Avatar:
@@ -14,47 +21,86 @@ class Avatar:
 
     avatar_size = avatar_settings.AVATAR_SIZE
 
-    async def __call__(self, user_id_str: str):
-        async def generate_avatar(user_id_str: str):
-            bytes = md5(user_id_str.encode("utf-8")).digest()
-
-            need_color = array([bit == "1" for byte in bytes[3 : 3 + 9] for bit in bin(byte)[2:].zfill(8)]).reshape(
-                6, 12
-            )
-            need_color = concatenate((need_color, need_color[::-1]), axis=0)
-
-            for i in range(12):
-                need_color[0, i] = 0
-                need_color[11, i] = 0
-                need_color[i, 0] = 0
-                need_color[i, 11] = 0
-
-            main_color = bytes[:3]
-            main_color = tuple(channel // 2 + 128 for channel in main_color)
-
-            if self.avatar_size % 12 != 0:
-                raise AvatarSizeNotCorrectException("Avatar size must be a multiple of 12")
-
-            img_size = (self.avatar_size, self.avatar_size)
-            block_size = self.avatar_size // 12
-
-            img = Image.new("RGB", img_size, self.background_color)
-            draw = ImageDraw.Draw(img)
-
-            for x in range(self.avatar_size):
-                for y in range(self.avatar_size):
-                    need_to_paint = need_color[x // block_size, y // block_size]
-                    if need_to_paint:
-                        draw.point((x, y), main_color)
-
-            storage = pathlib.Path(__file__).parent.parent.parent.resolve()
-            avatar_folder = storage.joinpath(pathlib.Path("assets/avatars"))
-            makedirs(avatar_folder, exist_ok=True)
-
-            avatar_path = avatar_folder.joinpath(pathlib.Path(user_id_str + ".png"))
-            img.save(avatar_path, "png")
-
-        await generate_avatar(user_id_str)
+    sizes = sorted({*avatar_settings.AVATAR_SIZES, avatar_settings.AVATAR_SIZE})
+
+    def __init__(self) -> None:
+        # (user_id, размер) -> закодированный PNG
+        self.cache = LRUCache(avatar_settings.AVATAR_CACHE_SIZE)
+
+    async def __call__(self, user_id_str: str, size: Optional[int] = None) -> bytes:
+        size = self.bucket(size)
+        png = self.cache.get((user_id_str, size))
+        if png is None:
+            png = await asyncio.to_thread(self._load_or_render, user_id_str, size)
+            self.cache.set((user_id_str, size), png)
+        return png
+
+    def bucket(self, size: Optional[int]) -> int:
+        """Rounds the requested size up to the nearest pre-rendered one."""
+        if size is None:
+            return self.avatar_size
+        return next((bucket for bucket in self.sizes if bucket >= size), self.sizes[-1])
+
+    def etag(self, user_id_str: str, size: int) -> str:
+        identicon = md5(user_id_str.encode("utf-8")).digest()
+        rendition = md5(identicon + f":{size}:{self.background_color}".encode("utf-8")).hexdigest()
+        return f'"{rendition}"'
+
+    async def response(
+        self, request: Request, user_id_str: str, size: Optional[int] = None, private: bool = False
+    ) -> Response:
+        size = self.bucket(size)
+        etag = self.etag(user_id_str, size)
+        visibility = "private" if private else "public"
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"{visibility}, max-age={avatar_settings.AVATAR_MAX_AGE}, immutable",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if etag in tags or "*" in tags:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        png = await self(user_id_str, size)
+        return Response(content=png, media_type="image/png", headers=headers)
+
+    def render(self, user_id_str: str, size: int) -> bytes:
+        """Renders a symmetric 12x12 identicon scaled to size x size pixels and encodes it as PNG."""
+        if size % 12 != 0:
+            raise AvatarSizeNotCorrectException("Avatar size must be a multiple of 12")
+
+        digest = md5(user_id_str.encode("utf-8")).digest()
+
+        need_color = np.unpackbits(np.frombuffer(digest[3 : 3 + 9], dtype=np.uint8)).reshape(6, 12).astype(bool)
+        need_color = np.concatenate((need_color, need_color[::-1]), axis=0)
+        need_color[[0, -1], :] = False
+        need_color[:, [0, -1]] = False
+
+        # блоки матрицы индексируются как (x, y), а массив изображения - как (строка, столбец)
+        block_size = size // 12
+        mask = np.kron(need_color.T, np.ones((block_size, block_size), dtype=bool))
+
+        main_color = np.array([channel // 2 + 128 for channel in digest[:3]], dtype=np.uint8)
+        background = np.array(ImageColor.getrgb(self.background_color), dtype=np.uint8)
+        pixels = np.where(mask[..., np.newaxis], main_color, background)
+
+        buffer = BytesIO()
+        Image.fromarray(pixels, "RGB").save(buffer, "png")
+        return buffer.getvalue()
+
+    def _load_or_render(self, user_id_str: str, size: int) -> bytes:
+        size_folder = get_avatar_storage().joinpath(pathlib.Path(str(size)))
+        avatar_path = size_folder.joinpath(pathlib.Path(f"{user_id_str}.png"))
+        if avatar_path.is_file():
+            return avatar_path.read_bytes()
+
+        png = self.render(user_id_str, size)
+        os.makedirs(size_folder, exist_ok=True)
+        # пишем во временный файл и переименовываем, чтобы параллельный запрос не прочитал половину файла
+        tmp_path = size_folder.joinpath(pathlib.Path(f".{uuid4()}.tmp"))
+        tmp_path.write_bytes(png)
+        os.replace(tmp_path, avatar_path)
+        return png
 
 
 create_avatar = Avatar()
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import pathlib
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import unquote
+from uuid import UUID, uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import file_settings
+from app.core.redis_session import Redis
+from app.core.storage import get_blob_storage
+from app.core.thumbnails import thumbnails
+from app.schemas.documents import Blob, Comment, Issue, WorkplaceFile
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Content-addressed file storage. Contents are stored once under their sha256 in
+    hash-sharded directories, workplace files reference them by hash and every
+    reference is counted in the Blob document.
+    """
+
+    def path(self, blob_id: str) -> pathlib.Path:
+        return get_blob_storage().joinpath(pathlib.Path(blob_id[:2], blob_id[2:4], blob_id))
+
+    def temp_folder(self) -> pathlib.Path:
+        return get_blob_storage().joinpath(pathlib.Path("tmp"))
+
+    def temp_path(self) -> pathlib.Path:
+        return self.temp_folder().joinpath(pathlib.Path(f"{uuid4()}.part"))
+
+    @staticmethod
+    def media_type(workplace_file: WorkplaceFile) -> str:
+        return workplace_file.content_type or mimetypes.guess_type(workplace_file.name)[0] or "application/octet-stream"
+
+    async def used_space(self, workplace_id: UUID) -> int:
+        used = await WorkplaceFile.find(WorkplaceFile.workplace_id == workplace_id).sum(WorkplaceFile.size)
+        return int(used or 0)
+
+    async def get(self, workplace_id: UUID, name: str) -> Optional[WorkplaceFile]:
+        return await WorkplaceFile.find_one(WorkplaceFile.workplace_id == workplace_id, WorkplaceFile.name == name)
+
+    async def add(
+        self,
+        workplace_id: UUID,
+        name: str,
+        tmp_path: pathlib.Path,
+        size: int,
+        blob_id: str,
+        content_type: Optional[str] = None,
+    ) -> WorkplaceFile:
+        """
+        Moves a fully written temporary file into the store and registers it in the workplace.
+        Identical content under the same name is not stored twice; a different file with an
+        existing name gets a numbered name instead of overwriting the old one.
+        """
+        # ссылка увеличивается до появления файла на диске, чтобы сборщик мусора его не удалил
+        await Blob.get_motor_collection().update_one(
+            {"_id": blob_id},
+            {"$inc": {"refs": 1}, "$setOnInsert": {"size": size, "creation_date": datetime.now()}},
+            upsert=True,
+        )
+        await asyncio.to_thread(self._place, tmp_path, self.path(blob_id))
+
+        stem, suffix = pathlib.PurePath(name).stem, pathlib.PurePath(name).suffix
+        candidate, attempt = name, 0
+        while True:
+            existing = await self.get(workplace_id, candidate)
+            if existing is None:
+                workplace_file = WorkplaceFile(
+                    workplace_id=workplace_id,
+                    name=candidate,
+                    blob_id=blob_id,
+                    size=size,
+                    content_type=content_type,
+                )
+                try:
+                    await workplace_file.insert()
+                    return workplace_file
+                except DuplicateKeyError:
+                    # имя заняли параллельной загрузкой, проверяем его ещё раз
+                    continue
+            if existing.blob_id == blob_id:
+                await self.release(blob_id)
+                return existing
+            attempt += 1
+            candidate = f"{stem} ({attempt}){suffix}"
+
+    async def release(self, blob_id: str) -> None:
+        await Blob.get_motor_collection().update_one({"_id": blob_id}, {"$inc": {"refs": -1}})
+
+    @staticmethod
+    def _place(tmp_path: pathlib.Path, blob_path: pathlib.Path) -> None:
+        if blob_path.is_file():
+            tmp_path.unlink(missing_ok=True)
+            return
+        os.makedirs(blob_path.parent, exist_ok=True)
+        os.replace(tmp_path, blob_path)
+
+
+blob_store = BlobStore()
+
+
+class BlobGarbageCollector:
+    """
+    Periodically drops workplace files that no Issue.files or Comment.files entry
+    references any more and deletes blobs that lost their last reference.
+    Only one worker collects at a time thanks to a Redis lock.
+    """
+
+    lock_name = "blob_gc"
+
+    def __init__(self, store: BlobStore) -> None:
+        self.store = store
+
+    async def run(self) -> None:
+        while True:
+            try:
+                if await Redis().acquire_lock(self.lock_name, file_settings.BLOB_GC_INTERVAL):
+                    await self.collect()
+            except Exception as e:
+                logger.error(f"***ERROR*** Blob garbage collection failed: {e}")
+            await asyncio.sleep(file_settings.BLOB_GC_INTERVAL)
+
+    async def collect(self) -> None:
+        threshold = datetime.now() - timedelta(seconds=file_settings.BLOB_GC_GRACE)
+        workplace_ids = await WorkplaceFile.get_motor_collection().distinct(
+            "workplace_id", {"creation_date": {"$lt": threshold}}
+        )
+        for workplace_id in workplace_ids:
+            referenced = set()
+            for document in (Issue, Comment):
+                files = await document.get_motor_collection().distinct("files", {"workplace_id": workplace_id})
+                # в задачах может лежать как имя файла, так и ссылка на него
+                referenced.update(unquote(pathlib.PurePosixPath(file).name) for file in files)
+            async for workplace_file in WorkplaceFile.find(
+                WorkplaceFile.workplace_id == workplace_id, WorkplaceFile.creation_date < threshold
+            ):
+                if workplace_file.name not in referenced:
+                    await workplace_file.delete()
+                    await self.store.release(workplace_file.blob_id)
+
+        async for blob in Blob.find(Blob.refs <= 0):
+            deleted = await Blob.get_motor_collection().find_one_and_delete({"_id": blob.id, "refs": {"$lte": 0}})
+            if deleted is not None:
+                await self.drop(blob.id)
+
+        await asyncio.to_thread(self._clean_temp_folder)
+
+    async def drop(self, blob_id: str) -> None:
+        """
+        Deletes the content of a collected blob. The file is first moved out of the store and put
+        back if an upload referenced the same content in the meantime: BlobStore.add counts the
+        reference before placing the file, so it either sees the reference here or places its own copy.
+        """
+        blob_path = self.store.path(blob_id)
+        grave = self.store.temp_folder().joinpath(pathlib.Path(f"{blob_id}.gc"))
+        buried = await asyncio.to_thread(self._bury, blob_path, grave)
+        if await Blob.get_motor_collection().find_one({"_id": blob_id}, {"_id": 1}) is not None:
+            if buried:
+                await asyncio.to_thread(os.replace, grave, blob_path)
+            return
+        await asyncio.to_thread(grave.unlink, missing_ok=True)
+        await asyncio.to_thread(shutil.rmtree, thumbnails.folder(blob_id), ignore_errors=True)
+
+    @staticmethod
+    def _bury(blob_path: pathlib.Path, grave: pathlib.Path) -> bool:
+        os.makedirs(grave.parent, exist_ok=True)
+        try:
+            os.replace(blob_path, grave)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _clean_temp_folder(self) -> None:
+        """Removes parts of uploads that were interrupted by a crash."""
+        temp_folder = self.store.temp_folder()
+        if not temp_folder.is_dir():
+            return
+        threshold = time.time() - file_settings.BLOB_GC_GRACE
+        for part in temp_folder.iterdir():
+            if part.stat().st_mtime < threshold:
+                part.unlink(missing_ok=True)
+
+
+blob_collector = BlobGarbageCollector(blob_store)
@@ -0,0 +1,41 @@
+from typing import List
+from uuid import UUID
+
+from pymongo import DESCENDING
+
+from app.core.pagination import KeysetCursor
+from app.schemas.documents import Issue
+from app.schemas.models.responses import Column, IssueSummary
+from app.schemas.types import State
+
+
+class SprintBoard:
+    """
+    Builds the sprint board with a single aggregation: issues are grouped by state in one
+    pass over the (sprint_id, creation_date, _id) index, each column gets its size and the
+    newest cards. Further cards of a column are read with the column cursor.
+    """
+
+    async def columns(self, sprint_id: UUID, limit: int) -> List[Column]:
+        pipeline = [
+            {"$match": {"sprint_id": sprint_id}},
+            {"$sort": {"creation_date": DESCENDING, "_id": DESCENDING}},
+            {"$project": IssueSummary.projection},
+            {"$group": {"_id": "$state", "count": {"$sum": 1}, "issues": {"$firstN": {"input": "$$ROOT", "n": limit}}}},
+        ]
+        groups = {group["_id"]: group async for group in Issue.get_motor_collection().aggregate(pipeline)}
+        columns = []
+        for state in State:
+            group = groups.get(state.value)
+            if group is None:
+                columns.append(Column(name=state))
+                continue
+            issues = [IssueSummary.model_validate(issue) for issue in group["issues"]]
+            next_cursor = None
+            if group["count"] > len(issues):
+                next_cursor = KeysetCursor.encode(issues[-1].creation_date, issues[-1].id)
+            columns.append(Column(name=state, count=group["count"], issues=issues, next_cursor=next_cursor))
+        return columns
+
+
+sprint_board = SprintBoard()
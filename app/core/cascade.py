@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Type
+from uuid import UUID, uuid4
+
+from beanie import Document
+from pymongo import ASCENDING, ReturnDocument
+
+from app.config import cascade_settings
+from app.core.deleted_sprints import deleted_sprints
+from app.schemas.documents import (
+    CascadeJob,
+    Comment,
+    Issue,
+    Sprint,
+    SprintStats,
+    Tombstone,
+    UserAssignedWorkplace,
+    Workplace,
+    WorkplaceSequence,
+)
+
+logger = logging.getLogger(__name__)
+
+# шаг: имя счётчика, коллекция, поле со ссылкой на удаляемый объект и вид tombstone
+Step = Tuple[str, Type[Document], str, Optional[str]]
+
+PLANS: Dict[str, List[Step]] = {
+    "sprint": [
+        ("comments", Comment, "sprint_id", "comment"),
+        ("issues", Issue, "sprint_id", "issue"),
+        # комментарии, успевшие появиться до удаления своих задач
+        ("comments", Comment, "sprint_id", "comment"),
+        ("stats", SprintStats, "sprint_id", None),
+    ],
+    # клиенты удалённого workplace уже потеряли доступ, tombstone им не нужны
+    "workplace": [
+        ("members", UserAssignedWorkplace, "workplace_id", None),
+        ("comments", Comment, "workplace_id", None),
+        ("issues", Issue, "workplace_id", None),
+        ("sprints", Sprint, "workplace_id", None),
+        ("stats", SprintStats, "workplace_id", None),
+        ("tombstones", Tombstone, "workplace_id", None),
+    ],
+}
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker."""
+
+
+class CascadeWorker:
+    """
+    Runs cascade-delete jobs in the background. Each batch is bounded by CASCADE_BATCH_SIZE
+    and followed by a pause that keeps the worker under CASCADE_RATE deletions per second.
+    """
+
+    def __init__(self) -> None:
+        self.owner = str(uuid4())
+        self.wakeup = asyncio.Event()
+
+    async def enqueue(self, kind: str, target_id: UUID, workplace_id: UUID, requested_by: UUID) -> CascadeJob:
+        job = CascadeJob(kind=kind, target_id=target_id, workplace_id=workplace_id, requested_by=requested_by)
+        await job.insert()
+        self.wakeup.set()
+        return job
+
+    async def run(self) -> None:
+        while True:
+            try:
+                while (job := await self.claim()) is not None:
+                    await self.process(job)
+            except Exception as e:
+                logger.error(f"***ERROR*** Cascade worker failed: {e}")
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), cascade_settings.CASCADE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> Optional[CascadeJob]:
+        now = datetime.now()
+        document = await CascadeJob.get_motor_collection().find_one_and_update(
+            {
+                "status": {"$in": ["pending", "running"]},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {"$set": {"status": "running", "owner": self.owner, "lease_until": self.lease()}, "$inc": {"attempts": 1}},
+            sort=[("creation_date", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return CascadeJob.model_validate(document) if document is not None else None
+
+    async def process(self, job: CascadeJob) -> None:
+        try:
+            plan = PLANS[job.kind]
+            for step in range(job.step, len(plan)):
+                name, document, field, kind = plan[step]
+                while count := await self.delete_batch(job, document, field, kind):
+                    await self.progress(job, {"$inc": {f"deleted.{name}": count}})
+                    await asyncio.sleep(count / cascade_settings.CASCADE_RATE)
+                await self.progress(job, {"$set": {"step": step + 1}})
+            await self.finish(job)
+        except LeaseLost:
+            logger.info(f"***INFO*** Cascade job {job.id} was taken over by another worker")
+        except Exception as e:
+            # задача останется за этим воркером до конца аренды, потом её повторят
+            status = "failed" if job.attempts >= cascade_settings.CASCADE_MAX_ATTEMPTS else "running"
+            await CascadeJob.get_motor_collection().update_one(
+                {"_id": job.id, "owner": self.owner}, {"$set": {"status": status, "error": str(e)}}
+            )
+            logger.error(f"***ERROR*** Cascade job {job.id} failed: {e}")
+
+    async def delete_batch(self, job: CascadeJob, document: Type[Document], field: str, kind: Optional[str]) -> int:
+        collection = document.get_motor_collection()
+        cursor = collection.find({field: job.target_id}, {"_id": 1}).limit(cascade_settings.CASCADE_BATCH_SIZE)
+        ids = [found["_id"] async for found in cursor]
+        if not ids:
+            return 0
+        # tombstone пишется до удаления, чтобы после падения он не потерялся
+        if kind is not None:
+            await Tombstone.record(job.workplace_id, kind, ids)
+        await collection.delete_many({"_id": {"$in": ids}})
+        return len(ids)
+
+    async def progress(self, job: CascadeJob, update: dict) -> None:
+        update.setdefault("$set", {})["lease_until"] = self.lease()
+        result = await CascadeJob.get_motor_collection().update_one({"_id": job.id, "owner": self.owner}, update)
+        if result.matched_count == 0:
+            raise LeaseLost()
+
+    async def finish(self, job: CascadeJob) -> None:
+        if job.kind == "sprint":
+            await Sprint.get_motor_collection().delete_one({"_id": job.target_id})
+            await deleted_sprints.remove(job.workplace_id, job.target_id)
+        else:
+            await Workplace.get_motor_collection().delete_one({"_id": job.target_id})
+            await WorkplaceSequence.get_motor_collection().delete_one({"_id": job.target_id})
+        await self.progress(
+            job, {"$set": {"status": "done", "error": None, "finish_date": datetime.now()}, "$unset": {"owner": ""}}
+        )
+
+    @staticmethod
+    def lease() -> datetime:
+        return datetime.now() + timedelta(seconds=cascade_settings.CASCADE_LEASE)
+
+
+cascade_worker = CascadeWorker()
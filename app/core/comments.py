@@ -0,0 +1,66 @@
+import logging
+from uuid import UUID
+
+from pymongo import ASCENDING
+
+from app.config import cache_settings
+from app.core.redis_session import Redis
+from app.schemas.documents import Comment, User, UserAssignedWorkplace
+from app.schemas.models import AuthorSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class CommentAuthors:
+    """
+    Keeps the author snapshots embedded in comments. A snapshot is written with the comment
+    and rewritten for all comments of the user when their profile changes.
+    """
+
+    lock_name = "comment_authors_backfill"
+
+    async def snapshot(self, membership: UserAssignedWorkplace) -> AuthorSnapshot:
+        user = await User.get(membership.user.ref.id)
+        if user is None:
+            return AuthorSnapshot(id=membership.id, user_id=membership.user.ref.id, role=membership.role)
+        return AuthorSnapshot(
+            id=membership.id, user_id=user.id, name=user.name, avatar_url=user.avatar_url, role=membership.role
+        )
+
+    async def refresh_user(self, user_id: UUID) -> None:
+        """Rewrites the snapshots in every workplace of the user; runs as a background task."""
+        async for membership in UserAssignedWorkplace.find(UserAssignedWorkplace.user.id == user_id):
+            snapshot = await self.snapshot(membership)
+            await Comment.get_motor_collection().update_many(
+                {"author.$id": membership.id}, {"$set": {"author_snapshot": snapshot.model_dump()}}
+            )
+
+    async def backfill(self) -> None:
+        """Fills snapshots of comments written before they existed, one batch of authors at a time."""
+        try:
+            if not await Redis().acquire_lock(self.lock_name, cache_settings.AUTHOR_BACKFILL_LOCK_TTL):
+                return
+            collection = Comment.get_motor_collection()
+            query = {"author_snapshot": None}
+            while (
+                documents := await collection.find(query, {"author": 1})
+                .sort("_id", ASCENDING)
+                .limit(cache_settings.AUTHOR_BACKFILL_BATCH)
+                .to_list(length=None)
+            ):
+                query = {"author_snapshot": None, "_id": {"$gt": documents[-1]["_id"]}}
+                for membership_id in {document["author"].id for document in documents}:
+                    membership = await UserAssignedWorkplace.get(membership_id)
+                    # автор мог покинуть workplace, тогда остаётся только id
+                    snapshot = (
+                        AuthorSnapshot(id=membership_id) if membership is None else await self.snapshot(membership)
+                    )
+                    await collection.update_many(
+                        {"author.$id": membership_id, "author_snapshot": None},
+                        {"$set": {"author_snapshot": snapshot.model_dump()}},
+                    )
+        except Exception as e:
+            logger.error(f"***ERROR*** Comment author backfill failed: {e}")
+
+
+comment_authors = CommentAuthors()
@@ -0,0 +1,34 @@
+from typing import List
+from uuid import UUID
+
+from app.core.redis_session import Redis
+from app.schemas.documents import Sprint
+
+
+class DeletedSprints:
+    """
+    Ids of the sprints that are hidden but still wait for their cascade job, cached in a
+    Redis set per workplace. Every read path and write of issues and comments excludes
+    them, so the set is read once per request instead of querying MongoDB each time.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis()
+
+    async def ids(self, workplace_id: UUID) -> List[UUID]:
+        cached = await self.redis.get_deleted_sprints(str(workplace_id))
+        if cached is None:
+            ids = await Sprint.deleted_ids(workplace_id)
+            cached = await self.redis.fill_deleted_sprints(str(workplace_id), [str(sprint_id) for sprint_id in ids])
+        return [UUID(sprint_id) for sprint_id in cached]
+
+    async def add(self, workplace_id: UUID, sprint_id: UUID) -> None:
+        """Must be called after the sprint is marked as deleted in MongoDB."""
+        await self.redis.add_deleted_sprint(str(workplace_id), str(sprint_id))
+
+    async def remove(self, workplace_id: UUID, sprint_id: UUID) -> None:
+        """Called once the cascade has removed everything that belonged to the sprint."""
+        await self.redis.remove_deleted_sprint(str(workplace_id), str(sprint_id))
+
+
+deleted_sprints = DeletedSprints()
@@ -1,25 +1,63 @@
+import asyncio
+import os
 import pathlib
-from os import makedirs
+from hashlib import sha256
+from typing import BinaryIO
 from uuid import UUID
 
 from fastapi import UploadFile
 
-from app.core.storage import get_workplace_storage
+from app.config import file_settings
+from app.core.blobs import blob_store
+from app.core.exceptions import FileTooLargeException
+from app.core.thumbnails import thumbnails
+from app.schemas.models import StoredFile
 
 
 class DownloadFiles:
-    async def __call__(self, file: UploadFile, workplace_id: UUID) -> dict:
-        async def download_file(file: UploadFile, workplace_id: UUID) -> dict:
-            main_download_folder = get_workplace_storage()
-            workplace_download_folder = main_download_folder.joinpath(pathlib.Path(f"{workplace_id}"))
-            makedirs(main_download_folder, exist_ok=True)
-            makedirs(workplace_download_folder, exist_ok=True)
-            photo_path = workplace_download_folder.joinpath(pathlib.Path(f"{file.filename}"))
-            with open(photo_path, "wb+") as file_object:
-                file_object.write(file.file.read())
-            return file.filename
-
-        return await download_file(file, workplace_id)
+    """
+    Streams an upload to disk chunk by chunk: the file is never held in memory,
+    disk IO runs in worker threads and the content is handed over to the blob store
+    only after it has been fully written.
+    """
+
+    async def __call__(self, file: UploadFile, workplace_id: UUID) -> StoredFile:
+        if file.size is not None and file.size > file_settings.MAX_FILE_SIZE:
+            raise FileTooLargeException("Превышен максимальный размер файла")
+
+        used = await blob_store.used_space(workplace_id)
+        filename = pathlib.Path(f"{file.filename}").name
+        await asyncio.to_thread(os.makedirs, blob_store.temp_folder(), exist_ok=True)
+        tmp_path = blob_store.temp_path()
+
+        digest = sha256()
+        size = 0
+        try:
+            file_object = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                while chunk := await file.read(file_settings.UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > file_settings.MAX_FILE_SIZE:
+                        raise FileTooLargeException("Превышен максимальный размер файла")
+                    if used + size > file_settings.MAX_WORKPLACE_STORAGE:
+                        raise FileTooLargeException("Превышен объём хранилища воркплейса")
+                    await asyncio.to_thread(self._write_chunk, file_object, digest, chunk)
+            finally:
+                await asyncio.to_thread(file_object.close)
+            workplace_file = await blob_store.add(
+                workplace_id, filename, tmp_path, size, digest.hexdigest(), file.content_type
+            )
+        except BaseException:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            raise
+        if thumbnails.accepts(workplace_file.name, workplace_file.content_type):
+            await thumbnails.submit(workplace_file.blob_id, blob_store.path(workplace_file.blob_id))
+        return StoredFile(filename=workplace_file.name, size=size, hash=workplace_file.blob_id)
+
+    @staticmethod
+    def _write_chunk(file_object: BinaryIO, digest, chunk: bytes) -> None:
+        digest.update(chunk)
+        file_object.write(chunk)
 
 
 downloader = DownloadFiles()
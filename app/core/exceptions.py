@@ -45,6 +45,11 @@ class ForbiddenException(CommonException):
         super().__init__(status.HTTP_403_FORBIDDEN, error)
 
 
+class ServiceUnavailable(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_503_SERVICE_UNAVAILABLE, error)
+
+
 class UserFoundException(CommonException):
     def __init__(self, error: str) -> None:
         super().__init__(status.HTTP_404_NOT_FOUND, error)
@@ -105,6 +110,41 @@ class WorkplaceFileNotFoundException(CommonException):
         super().__init__(status.HTTP_404_NOT_FOUND, error)
 
 
+class ConflictException(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_409_CONFLICT, error)
+
+
+class UploadSessionNotFoundError(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_404_NOT_FOUND, error)
+
+
+class RangeNotSatisfiableException(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, error)
+
+
+class FileTooLargeException(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, error)
+
+
 class AvatarSizeNotCorrectException(CommonException):
     def __init__(self, error: str) -> None:
         super().__init__(status.HTTP_500_INTERNAL_SERVER_ERROR, error)
+
+
+class MemberNotFoundError(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_404_NOT_FOUND, error)
+
+
+class ForeignMemberError(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_400_BAD_REQUEST, error)
+
+
+class JobNotFoundError(CommonException):
+    def __init__(self, error: str) -> None:
+        super().__init__(status.HTTP_404_NOT_FOUND, error)
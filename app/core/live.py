@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional, Set
+from uuid import UUID
+
+from app.config import live_settings
+from app.core.redis_session import Redis
+from app.schemas.models.responses import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+RESYNC = json.dumps({"type": "resync"})
+
+
+class Subscriber:
+    """A single WebSocket/SSE connection with its own bounded queue of serialized events."""
+
+    def __init__(self, workplace_id: UUID, sprint_id: Optional[UUID]) -> None:
+        self.workplace_id = workplace_id
+        self.sprint_id = str(sprint_id) if sprint_id is not None else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=live_settings.LIVE_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, sprint_ids: Iterable[str]) -> bool:
+        return self.sprint_id is None or self.sprint_id in sprint_ids
+
+    def push(self, message: str) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # медленный клиент: события выбрасываются, соединение закрывается после RESYNC
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def next(self, timeout: float) -> Optional[str]:
+        """Returns the next event, "" on heartbeat timeout or None when the client must resync and leave."""
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return ""
+        return message
+
+
+class LiveHub:
+    """
+    Fans out workplace change events to the connections of this worker. Routers publish
+    events to Redis pub/sub, and every worker keeps exactly one pattern subscription,
+    so the number of Redis connections does not depend on the number of clients.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis()
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+
+    def subscribe(self, workplace_id: UUID, sprint_id: Optional[UUID] = None) -> Subscriber:
+        subscriber = Subscriber(workplace_id, sprint_id)
+        self.subscribers.setdefault(str(workplace_id), set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self.subscribers.get(str(subscriber.workplace_id))
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[str(subscriber.workplace_id)]
+
+    async def publish(
+        self,
+        workplace_id: UUID,
+        type: str,
+        ids: Iterable[UUID],
+        sprint_ids: Iterable[UUID] = (),
+        issue_id: Optional[UUID] = None,
+        seq: Optional[int] = None,
+    ) -> None:
+        event = LiveEvent(
+            type=type, ids=list(ids), sprint_ids=list(dict.fromkeys(sprint_ids)), issue_id=issue_id, seq=seq
+        )
+        try:
+            await self.redis.publish_live_event(str(workplace_id), event.model_dump_json(exclude_none=True))
+        except Exception:
+            # изменение уже записано; клиенты догонят его через /changes
+            logger.exception("Не удалось опубликовать событие %s", type)
+
+    def dispatch(self, workplace_id: str, message: str) -> None:
+        subscribers = self.subscribers.get(workplace_id)
+        if not subscribers:
+            return
+        sprint_ids = json.loads(message).get("sprint_ids", [])
+        for subscriber in list(subscribers):
+            if subscriber.wants(sprint_ids):
+                subscriber.push(message)
+
+    def resync_all(self) -> None:
+        for subscribers in self.subscribers.values():
+            for subscriber in list(subscribers):
+                subscriber.push(RESYNC)
+
+    async def run(self) -> None:
+        reconnected = False
+        while True:
+            pubsub = self.redis.live_events()
+            try:
+                await pubsub.psubscribe("live:*")
+                if reconnected:
+                    # события за время разрыва потеряны
+                    self.resync_all()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.dispatch(message["channel"].split(":", 1)[1], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Подписка на события прервалась")
+            finally:
+                await pubsub.aclose()
+            reconnected = True
+            await asyncio.sleep(live_settings.LIVE_RECONNECT_DELAY)
+
+
+live_hub = LiveHub()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+from pydantic import ValidationError
+
+from app.config import email_settings
+from app.core.redis_session import Redis
+from app.schemas.models import OutboxMail
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """
+    A fixed number of SMTP sessions kept open between letters. A session the server has
+    closed while idle is reconnected once; a session that failed otherwise is reopened on next use.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.clients: asyncio.Queue[aiosmtplib.SMTP] = asyncio.Queue()
+        for _ in range(size):
+            self.clients.put_nowait(self._client())
+
+    @staticmethod
+    def _client() -> aiosmtplib.SMTP:
+        credentials = email_settings.EMAIL_USE_CREDENTIALS
+        return aiosmtplib.SMTP(
+            hostname=email_settings.EMAIL_HOST,
+            port=email_settings.EMAIL_PORT,
+            username=email_settings.EMAIL_USERNAME if credentials else None,
+            password=email_settings.EMAIL_PASSWORD if credentials else None,
+            use_tls=email_settings.EMAIL_SSL_TLS,
+            start_tls=email_settings.EMAIL_STARTTLS,
+            validate_certs=email_settings.EMAIL_VALIDATE_CERTS,
+            timeout=email_settings.MAIL_SEND_TIMEOUT,
+        )
+
+    async def send(self, message: EmailMessage) -> None:
+        client = await self.clients.get()
+        try:
+            if not client.is_connected:
+                await client.connect()
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                client.close()
+                await client.connect()
+                await client.send_message(message)
+        except Exception:
+            client.close()
+            raise
+        finally:
+            self.clients.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self.clients.empty():
+            client = self.clients.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+
+
+class MailWorker:
+    """
+    Sends letters from the Redis outbox in batches over the SMTP pool. A letter stays in the
+    worker's processing list until it is sent, retried with exponential backoff or moved to
+    the dead-letter list. Workers mark themselves alive on every iteration, and the letters of a
+    worker that has stopped doing so are returned to the outbox by the others.
+    """
+
+    def __init__(self, pool: SMTPPool) -> None:
+        self.pool = pool
+        self.redis = Redis()
+        self.worker = email_settings.MAIL_WORKER_ID
+
+    async def run(self) -> None:
+        await self.redis.restore_processing_mail(self.worker)
+        while True:
+            try:
+                now = time.time()
+                await self.redis.beat_mail_worker(self.worker, now)
+                await self.reclaim(now)
+                await self.redis.release_due_mail(now)
+                batch = await self.redis.take_mail(
+                    self.worker, email_settings.MAIL_BATCH_SIZE, email_settings.MAIL_POLL_TIMEOUT
+                )
+                await asyncio.gather(*(self.deliver(raw) for raw in batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"***ERROR*** Mail worker failed: {e}")
+                await asyncio.sleep(email_settings.MAIL_POLL_TIMEOUT)
+
+    async def reclaim(self, now: float) -> None:
+        for worker in await self.redis.stale_mail_workers(now - email_settings.MAIL_WORKER_TIMEOUT):
+            if worker != self.worker:
+                await self.redis.restore_processing_mail(worker)
+                await self.redis.forget_mail_worker(worker)
+
+    async def deliver(self, raw: str) -> None:
+        try:
+            mail = OutboxMail.model_validate_json(raw)
+        except ValidationError as e:
+            logger.error(f"***ERROR*** Malformed letter in the outbox: {e}")
+            await self.redis.bury_mail(self.worker, raw, raw)
+            return
+        try:
+            await self.pool.send(self.message(mail))
+        except Exception as e:
+            await self.fail(raw, mail, e)
+        else:
+            await self.redis.ack_mail(self.worker, raw)
+
+    async def fail(self, raw: str, mail: OutboxMail, error: Exception) -> None:
+        mail.attempts += 1
+        mail.error = str(error)
+        # 5xx означает, что повтор не поможет
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+            permanent = all(refused.code >= 500 for refused in error.recipients)
+        else:
+            permanent = isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+        if permanent or mail.attempts >= email_settings.MAIL_MAX_ATTEMPTS:
+            logger.error(f"***ERROR*** Letter {mail.id} moved to the dead-letter list: {error}")
+            await self.redis.bury_mail(self.worker, raw, mail.model_dump_json())
+            return
+        delay = min(email_settings.MAIL_RETRY_DELAY * 2 ** (mail.attempts - 1), email_settings.MAIL_RETRY_MAX_DELAY)
+        await self.redis.retry_mail(self.worker, raw, mail.model_dump_json(), time.time() + delay)
+
+    @staticmethod
+    def message(mail: OutboxMail) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = email_settings.EMAIL_FROM
+        message["To"] = ", ".join(mail.recipients)
+        message["Subject"] = mail.subject
+        message.set_content(mail.body, subtype=mail.subtype)
+        return message
@@ -0,0 +1,28 @@
+from typing import Iterable, List
+from uuid import UUID
+
+from beanie.operators import In
+
+from app.core.exceptions import ForeignMemberError, MemberNotFoundError
+from app.schemas.documents import UserAssignedWorkplace
+
+
+class MemberResolver:
+    """Resolves workplace member ids with a single query instead of one lookup per id."""
+
+    async def resolve(self, workplace_id: UUID, ids: Iterable[UUID]) -> List[UserAssignedWorkplace]:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        members = await UserAssignedWorkplace.find(In(UserAssignedWorkplace.id, ids)).to_list()
+        members = {member.id: member for member in members}
+        missing = [str(id) for id in ids if id not in members]
+        if missing:
+            raise MemberNotFoundError(f"Пользователь не найден в воркплейсе: {', '.join(missing)}")
+        foreign = [str(id) for id in ids if members[id].workplace_id != workplace_id]
+        if foreign:
+            raise ForeignMemberError(f"Пользователь не принадлежит воркплейсу: {', '.join(foreign)}")
+        return [members[id] for id in ids]
+
+
+member_resolver = MemberResolver()
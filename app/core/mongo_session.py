@@ -1,4 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Any, Awaitable, Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession
 
 from app.config import mongo_settings
 
@@ -11,3 +13,18 @@ class MongoManager:
 
     def get_async_client(self) -> AsyncIOMotorClient:
         return AsyncIOMotorClient(str(mongo_settings.MONGO_URL), uuidRepresentation="standard")
+
+
+async def run_in_transaction(
+    client: AsyncIOMotorClient,
+    callback: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[Any]],
+    **options: Any,
+) -> Any:
+    """
+    Runs the callback in a transaction (retried on transient errors) or without one if they are disabled.
+    Options such as read_concern are passed to the transaction.
+    """
+    if not mongo_settings.MONGO_TRANSACTIONS:
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback, **options)
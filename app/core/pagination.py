@@ -0,0 +1,70 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+
+from app.core.exceptions import ValidationError
+
+
+class KeysetCursor:
+    """
+    Opaque continuation token for keyset pagination over (field, _id).
+    The sort field is a datetime that may be missing; MongoDB orders missing values
+    before any date in ascending order and after them in descending order.
+    """
+
+    @staticmethod
+    def encode(value: Optional[datetime], id: UUID) -> str:
+        payload = {"v": value.isoformat() if value is not None else None, "id": str(id)}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    @staticmethod
+    def decode(cursor: str) -> Tuple[Optional[datetime], UUID]:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = datetime.fromisoformat(payload["v"]) if payload["v"] is not None else None
+            return value, UUID(payload["id"])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise ValidationError("Некорректный курсор")
+
+
+def keyset_filter(field: str, value: Optional[datetime], id: UUID, direction: int) -> dict:
+    if direction == ASCENDING:
+        if value is None:
+            return {"$or": [{field: None, "_id": {"$gt": id}}, {field: {"$ne": None}}]}
+        return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": id}}]}
+    if value is None:
+        return {field: None, "_id": {"$lt": id}}
+    return {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": id}}, {field: None}]}
+
+
+async def keyset_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    projection: dict,
+    field: str,
+    direction: int,
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[List[dict], Optional[str]]:
+    """Reads one page of raw documents and the cursor for the next page, if there is one."""
+    if cursor:
+        value, id = KeysetCursor.decode(cursor)
+        query = {"$and": [query, keyset_filter(field, value, id, direction)]}
+    documents: List[Any] = (
+        await collection.find(query, projection)
+        .sort([(field, direction), ("_id", direction)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = KeysetCursor.encode(last.get(field), last["_id"])
+    return documents, next_cursor
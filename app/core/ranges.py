@@ -0,0 +1,88 @@
+import asyncio
+import pathlib
+from email.utils import formatdate
+from hashlib import md5
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from app.config import file_settings
+from app.core.exceptions import RangeNotSatisfiableException
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=start-end" range into inclusive offsets.
+    Returns None for ranges that should be ignored (other units or several ranges).
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+    # в пустом файле нет ни одного байта, который можно отдать
+    if size == 0:
+        raise RangeNotSatisfiableException("Некорректный диапазон")
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first == "":
+            # bytes=-N: последние N байт
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiableException("Некорректный диапазон")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiableException("Некорректный диапазон")
+    return start, min(end, size - 1)
+
+
+async def iter_file(path: pathlib.Path, start: int, length: int) -> AsyncIterator[bytes]:
+    file_object = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(file_object.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(file_object.read, min(file_settings.UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(file_object.close)
+
+
+async def ranged_file_response(
+    request: Request, path: pathlib.Path, media_type: str, etag: Optional[str] = None
+) -> Response:
+    """FileResponse with support for a single byte range and If-Range validation."""
+    stat = await asyncio.to_thread(path.stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    if etag is None:
+        etag = f'"{md5(f"{stat.st_mtime}-{stat.st_size}".encode()).hexdigest()}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Last-Modified": last_modified}
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # диапазон отдаётся только если у клиента та же версия файла, иначе - файл целиком
+    if range_header is not None and (if_range is None or if_range.strip() in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except RangeNotSatisfiableException:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{stat.st_size}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                iter_file(path, start, length),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=media_type,
+                headers=headers,
+            )
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
@@ -1,9 +1,40 @@
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
 import redis.asyncio as redis
 from pydantic import EmailStr
+from redis.asyncio.client import PubSub
+from redis.exceptions import WatchError
 
-from app.config import email_settings, redis_settings
+from app.config import cache_settings, email_settings, file_settings, redis_settings
 from app.schemas.models.auth import UserRegister
 
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+HOLD_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# версия в кэше только растёт, даже если инвалидации пришли не по порядку
+RAISE_TOKEN_VERSION = """
+local current = redis.call("get", KEYS[1])
+if not current or tonumber(current) < tonumber(ARGV[1]) then
+    redis.call("set", KEYS[1], ARGV[1], "EX", ARGV[2])
+end
+return 0
+"""
+
+# отметка о том, что множество удалённых спринтов заполнено из базы
+DELETED_SPRINTS_FILLED = "-"
+
 
 class Redis:
 
@@ -40,3 +71,217 @@ class Redis:
     async def get_invite_user_email(self, uuid: str):
         email = await self.con.get(uuid)
         return email
+
+    async def get_membership(self, user_id: str, workplace_id: str) -> str | None:
+        return await self.con.get(f"membership:{user_id}:{workplace_id}")
+
+    async def set_membership(self, user_id: str, workplace_id: str, membership: str) -> None:
+        await self.con.set(f"membership:{user_id}:{workplace_id}", membership, ex=cache_settings.MEMBERSHIP_CACHE_TTL)
+
+    async def delete_membership(self, user_id: str, workplace_id: str) -> None:
+        await self.con.delete(f"membership:{user_id}:{workplace_id}")
+
+    async def get_user_workplaces(self, user_id: str) -> str | None:
+        return await self.con.get(f"user_workplaces:{user_id}")
+
+    async def set_user_workplaces(self, user_id: str, workplaces: str) -> None:
+        await self.con.set(f"user_workplaces:{user_id}", workplaces, ex=cache_settings.USER_WORKPLACES_CACHE_TTL)
+
+    async def delete_user_workplaces(self, user_id: str) -> None:
+        await self.con.delete(f"user_workplaces:{user_id}")
+
+    async def get_token_version(self, user_id: str) -> str | None:
+        return await self.con.get(f"token_version:{user_id}")
+
+    async def set_token_version(self, user_id: str, version: int) -> None:
+        """Caches a version read from MongoDB; never overwrites a version written by an invalidation."""
+        await self.con.set(f"token_version:{user_id}", version, nx=True, ex=cache_settings.TOKEN_VERSION_TTL)
+
+    async def raise_token_version(self, user_id: str, version: int) -> None:
+        await self.con.eval(
+            RAISE_TOKEN_VERSION, 1, f"token_version:{user_id}", version, cache_settings.TOKEN_VERSION_TTL
+        )
+
+    async def acquire_lock(self, name: str, ttl: int) -> Optional[str]:
+        """Returns the token of the acquired lock or None if the lock is held by someone else."""
+        token = str(uuid4())
+        return token if await self.con.set(f"lock:{name}", token, nx=True, ex=ttl) else None
+
+    async def release_lock(self, name: str, token: str) -> None:
+        # после истечения TTL замок может принадлежать другому владельцу
+        await self.con.eval(RELEASE_LOCK, 1, f"lock:{name}", token)
+
+    async def hold_lock(self, name: str, token: str, ttl: int) -> None:
+        """Keeps the lock for another ttl seconds instead of releasing it."""
+        await self.con.eval(HOLD_LOCK, 1, f"lock:{name}", token, ttl)
+
+    async def create_upload_session(self, upload_id: str, session: dict) -> None:
+        await self.con.hset(f"upload:{upload_id}", mapping=session)
+        await self.con.expire(f"upload:{upload_id}", file_settings.UPLOAD_SESSION_TTL)
+
+    async def get_upload_session(self, upload_id: str) -> dict:
+        return await self.con.hgetall(f"upload:{upload_id}")
+
+    async def set_upload_offset(self, upload_id: str, offset: int) -> None:
+        await self.con.hset(f"upload:{upload_id}", "offset", offset)
+        await self.con.expire(f"upload:{upload_id}", file_settings.UPLOAD_SESSION_TTL)
+
+    async def delete_upload_session(self, upload_id: str) -> None:
+        await self.con.delete(f"upload:{upload_id}")
+
+    async def get_deleted_sprints(self, workplace_id: str) -> Optional[List[str]]:
+        """Returns None when the set was not filled from MongoDB yet."""
+        members = await self.con.smembers(f"sprints:deleted:{workplace_id}")
+        if DELETED_SPRINTS_FILLED not in members:
+            return None
+        return [member for member in members if member != DELETED_SPRINTS_FILLED]
+
+    async def fill_deleted_sprints(self, workplace_id: str, sprint_ids: List[str]) -> List[str]:
+        # добавление, а не замена: удаление, случившееся во время чтения из базы, не теряется
+        async with self.con.pipeline(transaction=True) as pipe:
+            pipe.sadd(f"sprints:deleted:{workplace_id}", DELETED_SPRINTS_FILLED, *sprint_ids)
+            pipe.expire(f"sprints:deleted:{workplace_id}", cache_settings.DELETED_SPRINTS_CACHE_TTL)
+            pipe.smembers(f"sprints:deleted:{workplace_id}")
+            *_, members = await pipe.execute()
+        return [member for member in members if member != DELETED_SPRINTS_FILLED]
+
+    async def add_deleted_sprint(self, workplace_id: str, sprint_id: str) -> None:
+        async with self.con.pipeline(transaction=True) as pipe:
+            pipe.sadd(f"sprints:deleted:{workplace_id}", sprint_id)
+            pipe.expire(f"sprints:deleted:{workplace_id}", cache_settings.DELETED_SPRINTS_CACHE_TTL)
+            await pipe.execute()
+
+    async def remove_deleted_sprint(self, workplace_id: str, sprint_id: str) -> None:
+        await self.con.srem(f"sprints:deleted:{workplace_id}", sprint_id)
+
+    async def is_member_index_ready(self, workplace_id: str) -> bool:
+        return bool(await self.con.exists(f"members:{workplace_id}:ready"))
+
+    async def get_member_index_version(self, workplace_id: str) -> int:
+        return int(await self.con.get(f"members:{workplace_id}:version") or 0)
+
+    async def raise_member_index_version(self, workplace_id: str) -> None:
+        await self.con.incr(f"members:{workplace_id}:version")
+
+    async def replace_member_index(
+        self, workplace_id: str, terms: List[str], members: Dict[str, str], version: int
+    ) -> bool:
+        """Returns False without writing when a member has changed since the version was read."""
+        async with self.con.pipeline(transaction=True) as pipe:
+            await pipe.watch(f"members:{workplace_id}:version")
+            if int(await pipe.get(f"members:{workplace_id}:version") or 0) != version:
+                await pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.delete(f"members:{workplace_id}:terms", f"members:{workplace_id}:data")
+            if terms:
+                pipe.zadd(f"members:{workplace_id}:terms", {term: 0 for term in terms})
+            if members:
+                pipe.hset(f"members:{workplace_id}:data", mapping=members)
+            pipe.set(f"members:{workplace_id}:ready", 1)
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def set_member(self, workplace_id: str, user_id: str, terms: List[str], member: str) -> None:
+        async with self.con.pipeline(transaction=True) as pipe:
+            pipe.zadd(f"members:{workplace_id}:terms", {term: 0 for term in terms})
+            pipe.hset(f"members:{workplace_id}:data", user_id, member)
+            await pipe.execute()
+
+    async def get_member(self, workplace_id: str, user_id: str) -> str | None:
+        return await self.con.hget(f"members:{workplace_id}:data", user_id)
+
+    async def get_members(self, workplace_id: str, user_ids: List[str] | None = None) -> List[str | None]:
+        if user_ids is None:
+            return await self.con.hvals(f"members:{workplace_id}:data")
+        if not user_ids:
+            return []
+        return await self.con.hmget(f"members:{workplace_id}:data", user_ids)
+
+    async def delete_member(self, workplace_id: str, user_id: str, terms: List[str]) -> None:
+        async with self.con.pipeline(transaction=True) as pipe:
+            if terms:
+                pipe.zrem(f"members:{workplace_id}:terms", *terms)
+            pipe.hdel(f"members:{workplace_id}:data", user_id)
+            await pipe.execute()
+
+    async def range_member_terms(
+        self, workplace_id: str, ranges: List[Tuple[str, str]], limit: Optional[int] = None, offset: int = 0
+    ) -> List[List[str]]:
+        # без limit возвращаются все совпадения
+        offset = offset if limit is not None else None
+        async with self.con.pipeline(transaction=False) as pipe:
+            for start, stop in ranges:
+                pipe.zrangebylex(f"members:{workplace_id}:terms", start, stop, start=offset, num=limit)
+            return await pipe.execute()
+
+    async def delete_member_index(self, workplace_id: str) -> None:
+        await self.con.delete(
+            f"members:{workplace_id}:ready", f"members:{workplace_id}:terms", f"members:{workplace_id}:data"
+        )
+
+    async def publish_live_event(self, workplace_id: str, event: str) -> None:
+        await self.con.publish(f"live:{workplace_id}", event)
+
+    def live_events(self) -> PubSub:
+        return self.con.pubsub(ignore_subscribe_messages=True)
+
+    async def push_mail(self, mail: str) -> None:
+        await self.con.lpush("mail:outbox", mail)
+
+    async def take_mail(self, worker: str, count: int, timeout: float) -> List[str]:
+        """Moves up to count letters from the outbox to the worker's processing list, waiting for the first."""
+        first = await self.con.blmove("mail:outbox", f"mail:processing:{worker}", timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        taken = [first]
+        while len(taken) < count:
+            mail = await self.con.lmove("mail:outbox", f"mail:processing:{worker}", "RIGHT", "LEFT")
+            if mail is None:
+                break
+            taken.append(mail)
+        return taken
+
+    async def ack_mail(self, worker: str, mail: str) -> None:
+        await self.con.lrem(f"mail:processing:{worker}", 1, mail)
+
+    async def retry_mail(self, worker: str, mail: str, retry: str, at: float) -> None:
+        async with self.con.pipeline(transaction=True) as pipe:
+            pipe.zadd("mail:retry", {retry: at})
+            pipe.lrem(f"mail:processing:{worker}", 1, mail)
+            await pipe.execute()
+
+    async def bury_mail(self, worker: str, mail: str, dead: str) -> None:
+        async with self.con.pipeline(transaction=True) as pipe:
+            pipe.lpush("mail:dead", dead)
+            pipe.ltrim("mail:dead", 0, email_settings.MAIL_DEAD_LETTER_SIZE - 1)
+            pipe.lrem(f"mail:processing:{worker}", 1, mail)
+            await pipe.execute()
+
+    async def release_due_mail(self, now: float) -> int:
+        """Returns letters whose retry time has come to the outbox."""
+        due = await self.con.zrangebyscore("mail:retry", "-inf", now)
+        released = 0
+        for mail in due:
+            # письмо берёт тот, кто первым удалил его из очереди повторов
+            if await self.con.zrem("mail:retry", mail):
+                await self.con.lpush("mail:outbox", mail)
+                released += 1
+        return released
+
+    async def beat_mail_worker(self, worker: str, now: float) -> None:
+        await self.con.zadd("mail:workers", {worker: now})
+
+    async def stale_mail_workers(self, before: float) -> List[str]:
+        return await self.con.zrangebyscore("mail:workers", "-inf", before)
+
+    async def forget_mail_worker(self, worker: str) -> None:
+        await self.con.zrem("mail:workers", worker)
+
+    async def restore_processing_mail(self, worker: str) -> None:
+        """Returns letters left in the processing list by a crashed worker to the outbox."""
+        while await self.con.lmove(f"mail:processing:{worker}", "mail:outbox", "RIGHT", "RIGHT") is not None:
+            pass
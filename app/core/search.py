@@ -0,0 +1,88 @@
+from typing import Dict
+from uuid import UUID
+
+from app.config import search_settings
+from app.core.deleted_sprints import deleted_sprints
+from app.core.exceptions import ValidationError
+from app.schemas.documents import Comment, Issue
+from app.schemas.models.responses import IssueSearchHit, IssueSearchPage, IssueSummary
+
+
+class IssueSearch:
+    """
+    Relevance-ranked search over issue names, issue texts and comments of a workplace.
+    Both collections have a text index prefixed with workplace_id, so MongoDB maintains
+    the index on every write and each query only touches a single workplace.
+    """
+
+    async def search(self, workplace_id: UUID, query: str, page: int, limit: int) -> IssueSearchPage:
+        query = query.strip()
+        if not query:
+            return await self._latest(workplace_id, page, limit)
+
+        # ранжируются только первые SEARCH_WINDOW совпадений, дальше страниц нет
+        if page * limit >= search_settings.SEARCH_WINDOW:
+            raise ValidationError(f"Поиск возвращает не больше {search_settings.SEARCH_WINDOW} результатов")
+        window = min((page + 1) * limit, search_settings.SEARCH_WINDOW)
+        # задачи и комментарии удаляемых спринтов в выдачу не попадают
+        live = {"workplace_id": workplace_id, "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)}}
+        text_filter = {**live, "$text": {"$search": query}}
+
+        issues: Dict[UUID, dict] = {}
+        cursor = (
+            Issue.get_motor_collection()
+            .find(text_filter, {**IssueSummary.projection, "score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"})])
+            .limit(window)
+        )
+        async for document in cursor:
+            issues[document["_id"]] = document
+        scores = {issue_id: document["score"] for issue_id, document in issues.items()}
+
+        # задача поднимается в выдаче, если совпадение нашлось в её комментариях
+        comment_hits = Comment.get_motor_collection().aggregate(
+            [
+                {"$match": text_filter},
+                {"$group": {"_id": "$issue_id", "score": {"$max": {"$meta": "textScore"}}}},
+                {"$sort": {"score": -1}},
+                {"$limit": window},
+            ]
+        )
+        async for hit in comment_hits:
+            scores[hit["_id"]] = scores.get(hit["_id"], 0) + search_settings.SEARCH_COMMENT_WEIGHT * hit["score"]
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        page_items = ranked[page * limit : (page + 1) * limit]
+
+        missing = [issue_id for issue_id, _ in page_items if issue_id not in issues]
+        if missing:
+            async for document in Issue.get_motor_collection().find(
+                {"_id": {"$in": missing}, **live}, IssueSummary.projection
+            ):
+                issues[document["_id"]] = document
+
+        items = [
+            IssueSearchHit.model_validate({**issues[issue_id], "score": score})
+            for issue_id, score in page_items
+            if issue_id in issues
+        ]
+        has_more = len(ranked) > (page + 1) * limit and (page + 1) * limit < search_settings.SEARCH_WINDOW
+        return IssueSearchPage(items=items, page=page, limit=limit, has_more=has_more)
+
+    async def _latest(self, workplace_id: UUID, page: int, limit: int) -> IssueSearchPage:
+        cursor = (
+            Issue.get_motor_collection()
+            .find(
+                {"workplace_id": workplace_id, "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)}},
+                IssueSummary.projection,
+            )
+            .sort([("creation_date", -1), ("_id", -1)])
+            .skip(page * limit)
+            .limit(limit + 1)
+        )
+        documents = await cursor.to_list(length=limit + 1)
+        items = [IssueSearchHit.model_validate({**document, "score": 0}) for document in documents[:limit]]
+        return IssueSearchPage(items=items, page=page, limit=limit, has_more=len(documents) > limit)
+
+
+issue_search = IssueSearch()
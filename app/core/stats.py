@@ -0,0 +1,126 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Mapping
+from uuid import UUID, uuid4
+
+from pymongo.read_concern import ReadConcern
+
+from app.core.mongo_session import run_in_transaction
+from app.schemas.documents import Issue, Sprint, SprintStats
+from app.schemas.models.responses import Burndown, BurndownPoint
+from app.schemas.types import State
+
+FIELDS = ("state", "priority", "label")
+
+
+def today() -> datetime:
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class SprintStatistics:
+    """
+    Sprint counters by state, priority and label kept as daily $inc deltas, so that
+    progress and burndown are read in O(days) without touching the issues.
+    """
+
+    @staticmethod
+    def delta(issue: Mapping, sign: int) -> Counter:
+        counter = Counter({"total": sign})
+        for field in FIELDS:
+            counter[f"{field}.{issue[field]}"] += sign
+        return counter
+
+    def changes(self, before: Mapping, updates: Mapping) -> Dict[UUID, Counter]:
+        """Per-sprint deltas for an issue updated with the given values."""
+        after = {key: updates.get(key, before[key]) for key in (*FIELDS, "sprint_id")}
+        deltas: Dict[UUID, Counter] = {}
+        deltas.setdefault(before["sprint_id"], Counter()).update(self.delta(before, -1))
+        deltas.setdefault(after["sprint_id"], Counter()).update(self.delta(after, 1))
+        return deltas
+
+    async def apply(self, workplace_id: UUID, deltas: Mapping[UUID, Counter], session=None) -> None:
+        day = today()
+        for sprint_id, counter in deltas.items():
+            increments = {key: value for key, value in counter.items() if value != 0}
+            if not increments:
+                continue
+            await SprintStats.get_motor_collection().update_one(
+                {"sprint_id": sprint_id, "day": day, "seed": False},
+                {"$inc": increments, "$setOnInsert": {"_id": uuid4(), "workplace_id": workplace_id}},
+                upsert=True,
+                session=session,
+            )
+
+    async def _seed(self, sprint: Sprint) -> None:
+        # задачи, созданные до появления статистики, попадают в отдельный начальный документ;
+        # задачи и счётчики читаются из одного снимка, а каждая запись задачи меняет счётчики
+        # в той же транзакции, поэтому параллельные правки не теряются и не учитываются дважды
+        async def seed(session=None):
+            recorded = Counter()
+            async for document in SprintStats.get_motor_collection().find({"sprint_id": sprint.id}, session=session):
+                recorded.update(self._flatten(document))
+            current = Counter()
+            async for issue in Issue.get_motor_collection().find(
+                {"sprint_id": sprint.id}, {field: 1 for field in FIELDS}, session=session
+            ):
+                current.update(self.delta(issue, 1))
+            current.subtract(recorded)
+            await SprintStats.get_motor_collection().update_one(
+                {"sprint_id": sprint.id, "seed": True},
+                {
+                    "$setOnInsert": {
+                        "_id": uuid4(),
+                        "workplace_id": sprint.workplace_id,
+                        "day": sprint.start_date.replace(hour=0, minute=0, second=0, microsecond=0),
+                        **{key: value for key, value in current.items() if value != 0},
+                    }
+                },
+                upsert=True,
+                session=session,
+            )
+
+        client = SprintStats.get_motor_collection().database.client
+        await run_in_transaction(client, seed, read_concern=ReadConcern("snapshot"))
+
+    async def burndown(self, sprint: Sprint) -> Burndown:
+        documents = (
+            await SprintStats.get_motor_collection().find({"sprint_id": sprint.id}).sort("day", 1).to_list(length=None)
+        )
+        if not any(document["seed"] for document in documents):
+            await self._seed(sprint)
+            return await self.burndown(sprint)
+
+        start = sprint.start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = min(sprint.end_date.replace(hour=0, minute=0, second=0, microsecond=0), today())
+        counters = Counter()
+        points = []
+        index = 0
+        day = start
+        while day <= end or not points:
+            while index < len(documents) and documents[index]["day"] <= day:
+                counters.update(self._flatten(documents[index]))
+                index += 1
+            points.append(self._point(day, counters))
+            day += timedelta(days=1)
+        return Burndown(sprint_id=sprint.id, start_date=sprint.start_date, end_date=sprint.end_date, points=points)
+
+    @staticmethod
+    def _flatten(document: Mapping) -> Counter:
+        counter = Counter({"total": document.get("total", 0)})
+        for field in FIELDS:
+            for key, value in document.get(field, {}).items():
+                counter[f"{field}.{key}"] += value
+        return counter
+
+    @staticmethod
+    def _point(day: datetime, counters: Counter) -> BurndownPoint:
+        fields: Dict[str, Dict[str, int]] = {field: {} for field in FIELDS}
+        for key, value in counters.items():
+            field, _, name = key.partition(".")
+            if name and value:
+                fields[field][name] = value
+        done = fields["state"].get(State.DONE.value, 0)
+        return BurndownPoint(day=day, total=counters["total"], remaining=counters["total"] - done, **fields)
+
+
+sprint_statistics = SprintStatistics()
@@ -11,3 +11,15 @@ def get_avatar_storage():
     storage = pathlib.Path(__file__).parent.parent.parent.resolve()
     avatar_folder = storage.joinpath(pathlib.Path("assets/avatars"))
     return avatar_folder
+
+
+def get_blob_storage():
+    storage = pathlib.Path(__file__).parent.parent.parent.resolve()
+    blob_folder = storage.joinpath(pathlib.Path("assets/blobs"))
+    return blob_folder
+
+
+def get_thumbnail_storage():
+    storage = pathlib.Path(__file__).parent.parent.parent.resolve()
+    thumbnail_folder = storage.joinpath(pathlib.Path("assets/thumbnails"))
+    return thumbnail_folder
@@ -0,0 +1,60 @@
+from uuid import UUID
+
+from app.core.deleted_sprints import deleted_sprints
+from app.schemas.documents import Comment, Issue, Sprint, Tombstone, Workplace, WorkplaceSequence
+from app.schemas.models.responses import (
+    Changes,
+    CommentChange,
+    IssueChange,
+    SprintChange,
+    TombstoneChange,
+    WorkplaceChange,
+)
+
+
+class ChangeFeed:
+    """
+    Builds incremental updates for board clients. Every write stamps the document with
+    the next value of the workplace counter, deletions leave tombstones, so a client only
+    downloads what has changed after the sequence number it saw last.
+    """
+
+    async def changes(self, workplace_id: UUID, since: int) -> Changes:
+        # номера выдаются до записи и завершаются не по порядку, поэтому клиент получает
+        # не последний выданный номер, а тот, до которого все записи уже видны;
+        # более поздние изменения могут прийти повторно в следующем опросе
+        seq = await WorkplaceSequence.watermark(workplace_id)
+        query = {"workplace_id": workplace_id}
+        if since > 0:
+            query["seq"] = {"$gt": since}
+
+        workplace_query = {"_id": workplace_id, **({"seq": {"$gt": since}} if since > 0 else {})}
+        workplace = await Workplace.get_motor_collection().find_one(workplace_query, {"name": 1, "description": 1})
+        sprints = (
+            await Sprint.get_motor_collection()
+            .find({**query, "deleted": {"$ne": True}}, {"name": 1, "start_date": 1, "end_date": 1})
+            .to_list(length=None)
+        )
+        # содержимое удаляемых спринтов клиент убирает по надгробию спринта
+        live = {**query, "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)}}
+        issues = await Issue.get_motor_collection().find(live, IssueChange.projection).to_list(length=None)
+        comments = (
+            await Comment.get_motor_collection()
+            .find(live, {"text": 1, "files": 1, "creation_date": 1, "author": 1, "issue_id": 1})
+            .to_list(length=None)
+        )
+        tombstones = []
+        if since > 0:
+            tombstones = await Tombstone.find(Tombstone.workplace_id == workplace_id, Tombstone.seq > since).to_list()
+
+        return Changes(
+            seq=seq,
+            workplace=WorkplaceChange.model_validate(workplace) if workplace is not None else None,
+            sprints=[SprintChange.model_validate(sprint) for sprint in sprints],
+            issues=[IssueChange.model_validate(issue) for issue in issues],
+            comments=[CommentChange.model_validate(comment) for comment in comments],
+            tombstones=[TombstoneChange.model_validate(tombstone.model_dump()) for tombstone in tombstones],
+        )
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+from uuid import uuid4
+
+from PIL import Image, ImageOps
+
+from app.config import thumbnail_settings
+from app.core.redis_session import Redis
+from app.core.storage import get_thumbnail_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailPipeline:
+    """
+    Generates downscaled previews of image attachments on a worker pool after upload.
+    Thumbnails are stored per blob, so identical images are processed only once.
+    While a job is pending or shortly after it has failed, callers get None and serve the original instead.
+    """
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=thumbnail_settings.THUMBNAIL_WORKERS, thread_name_prefix="thumbnails"
+        )
+        self.sizes = sorted(thumbnail_settings.THUMBNAIL_SIZES)
+        self.format = thumbnail_settings.THUMBNAIL_FORMAT.upper()
+        self.extension = ".jpg" if self.format == "JPEG" else ".webp"
+        self.media_type = "image/jpeg" if self.format == "JPEG" else "image/webp"
+        # blob_id, для которых генерация уже запущена в этом процессе
+        self.pending: Set[str] = set()
+        self.tasks: Set[asyncio.Task] = set()
+
+    def folder(self, blob_id: str) -> pathlib.Path:
+        return get_thumbnail_storage().joinpath(pathlib.Path(blob_id[:2], blob_id))
+
+    def path(self, blob_id: str, size: int) -> pathlib.Path:
+        return self.folder(blob_id).joinpath(pathlib.Path(f"{size}{self.extension}"))
+
+    def bucket(self, size: Optional[int]) -> int:
+        if size is None:
+            return self.sizes[0]
+        return next((bucket for bucket in self.sizes if bucket >= size), self.sizes[-1])
+
+    @staticmethod
+    def accepts(name: str, content_type: Optional[str] = None) -> bool:
+        media_type = content_type or mimetypes.guess_type(name)[0] or ""
+        return media_type.startswith("image/") and media_type != "image/svg+xml"
+
+    async def submit(self, blob_id: str, source: pathlib.Path) -> None:
+        if blob_id in self.pending:
+            return
+        # другой воркер может уже обрабатывать это же изображение
+        lock = f"thumbnail:{blob_id}"
+        token = await Redis().acquire_lock(lock, thumbnail_settings.THUMBNAIL_JOB_TTL)
+        if token is None:
+            return
+        self.pending.add(blob_id)
+        task = asyncio.create_task(self._run(blob_id, source, lock, token))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def variant(self, blob_id: str, source: pathlib.Path, size: Optional[int] = None) -> Optional[pathlib.Path]:
+        path = self.path(blob_id, self.bucket(size))
+        if await asyncio.to_thread(path.is_file):
+            return path
+        # файл загружен до появления превью или задача потерялась при перезапуске
+        await self.submit(blob_id, source)
+        return None
+
+    async def _run(self, blob_id: str, source: pathlib.Path, lock: str, token: str) -> None:
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._generate, blob_id, source)
+        except Exception as e:
+            logger.error(f"***ERROR*** Thumbnail generation for {blob_id} failed: {e}")
+            # замок остаётся меткой ошибки: до его истечения отдаётся оригинал, а не новая попытка
+            await Redis().hold_lock(lock, token, thumbnail_settings.THUMBNAIL_FAILURE_TTL)
+        else:
+            await Redis().release_lock(lock, token)
+        finally:
+            self.pending.discard(blob_id)
+
+    def _generate(self, blob_id: str, source: pathlib.Path) -> None:
+        folder = self.folder(blob_id)
+        os.makedirs(folder, exist_ok=True)
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            if self.format == "JPEG" or not ("A" in image.getbands() or "transparency" in image.info):
+                image = image.convert("RGB")
+            else:
+                image = image.convert("RGBA")
+            for size in self.sizes:
+                target = self.path(blob_id, size)
+                if target.is_file():
+                    continue
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                tmp_path = folder.joinpath(pathlib.Path(f".{uuid4()}.tmp"))
+                thumbnail.save(tmp_path, self.format, quality=thumbnail_settings.THUMBNAIL_QUALITY)
+                os.replace(tmp_path, target)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+thumbnails = ThumbnailPipeline()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import pathlib
+from hashlib import sha256
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+from app.config import file_settings
+from app.core.blobs import blob_store
+from app.core.exceptions import ConflictException, FileTooLargeException, UploadSessionNotFoundError
+from app.core.redis_session import Redis
+from app.core.thumbnails import thumbnails
+from app.schemas.models import StoredFile, UploadCreation, UploadSessionOut
+
+
+class ResumableUploads:
+    """
+    Upload protocol for large files: create a session, send chunks with PATCH at the
+    current offset (a broken chunk can be resent from the last stored offset) and finalize.
+    The session state lives in Redis, the data - in a temporary file of the blob store.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis()
+
+    async def create(self, workplace_id: UUID, upload: UploadCreation) -> UploadSessionOut:
+        if upload.size > file_settings.MAX_FILE_SIZE:
+            raise FileTooLargeException("Превышен максимальный размер файла")
+        if await blob_store.used_space(workplace_id) + upload.size > file_settings.MAX_WORKPLACE_STORAGE:
+            raise FileTooLargeException("Превышен объём хранилища воркплейса")
+
+        upload_id = uuid4()
+        tmp_path = blob_store.temp_path()
+        await asyncio.to_thread(os.makedirs, tmp_path.parent, exist_ok=True)
+        await asyncio.to_thread(tmp_path.touch)
+        await self.redis.create_upload_session(
+            str(upload_id),
+            {
+                "workplace_id": str(workplace_id),
+                "filename": pathlib.Path(upload.filename).name,
+                "content_type": upload.content_type or "",
+                "size": upload.size,
+                "offset": 0,
+                "path": str(tmp_path),
+            },
+        )
+        return UploadSessionOut(id=upload_id, offset=0, size=upload.size)
+
+    async def get(self, workplace_id: UUID, upload_id: UUID) -> dict:
+        session = await self.redis.get_upload_session(str(upload_id))
+        if not session or session["workplace_id"] != str(workplace_id):
+            raise UploadSessionNotFoundError("Загрузка не найдена")
+        return session
+
+    async def status(self, workplace_id: UUID, upload_id: UUID) -> UploadSessionOut:
+        session = await self.get(workplace_id, upload_id)
+        return UploadSessionOut(id=upload_id, offset=int(session["offset"]), size=int(session["size"]))
+
+    async def append(
+        self, workplace_id: UUID, upload_id: UUID, offset: int, stream: AsyncIterator[bytes]
+    ) -> UploadSessionOut:
+        lock = f"upload:{upload_id}"
+        token = await self.redis.acquire_lock(lock, file_settings.UPLOAD_LOCK_TTL)
+        if token is None:
+            raise ConflictException("Этот файл уже загружается")
+        try:
+            session = await self.get(workplace_id, upload_id)
+            size = int(session["size"])
+            if offset != int(session["offset"]):
+                raise ConflictException(f"Ожидалось смещение {session['offset']}")
+
+            file_object = await asyncio.to_thread(open, session["path"], "r+b")
+            written = offset
+            try:
+                await asyncio.to_thread(file_object.seek, offset)
+                async for chunk in stream:
+                    if written + len(chunk) > size:
+                        raise FileTooLargeException("Данных больше, чем заявлено при создании загрузки")
+                    await asyncio.to_thread(file_object.write, chunk)
+                    written += len(chunk)
+            finally:
+                # сохраняем то, что успело записаться, даже если соединение оборвалось
+                await asyncio.to_thread(file_object.close)
+                await self.redis.set_upload_offset(str(upload_id), written)
+            return UploadSessionOut(id=upload_id, offset=written, size=size)
+        finally:
+            await self.redis.release_lock(lock, token)
+
+    async def finalize(self, workplace_id: UUID, upload_id: UUID) -> StoredFile:
+        # тот же замок, что и у записи: повторный finalize не должен добавить файл ещё раз
+        lock = f"upload:{upload_id}"
+        token = await self.redis.acquire_lock(lock, file_settings.UPLOAD_LOCK_TTL)
+        if token is None:
+            raise ConflictException("Этот файл уже загружается")
+        try:
+            session = await self.get(workplace_id, upload_id)
+            size = int(session["size"])
+            if int(session["offset"]) != size:
+                raise ConflictException("Файл загружен не полностью")
+            tmp_path = pathlib.Path(session["path"])
+            digest = await asyncio.to_thread(self._hash_file, tmp_path)
+            workplace_file = await blob_store.add(
+                workplace_id, session["filename"], tmp_path, size, digest, session["content_type"] or None
+            )
+            await self.redis.delete_upload_session(str(upload_id))
+        finally:
+            await self.redis.release_lock(lock, token)
+        if thumbnails.accepts(workplace_file.name, workplace_file.content_type):
+            await thumbnails.submit(workplace_file.blob_id, blob_store.path(workplace_file.blob_id))
+        return StoredFile(filename=workplace_file.name, size=size, hash=workplace_file.blob_id)
+
+    @staticmethod
+    def _hash_file(path: pathlib.Path) -> str:
+        digest = sha256()
+        with open(path, "rb") as file_object:
+            while chunk := file_object.read(file_settings.UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+resumable_uploads = ResumableUploads()
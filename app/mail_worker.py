@@ -0,0 +1,29 @@
+"""Outbox mail worker, started separately from the web application: python -m app.mail_worker"""
+import asyncio
+import logging
+import signal
+
+from app.config import email_settings
+from app.core.mailer import MailWorker, SMTPPool
+from app.core.redis_session import Redis
+
+
+async def main() -> None:
+    await Redis.connect_redis()
+    pool = SMTPPool(email_settings.MAIL_POOL_SIZE)
+    task = asyncio.create_task(MailWorker(pool).run())
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await pool.close()
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,9 +1,13 @@
 from app.routers.auth import router as register_router
 from app.routers.comment import router as comment_router
 from app.routers.files import router as files_router
+from app.routers.internal import router as internal_router
 from app.routers.issue import router as issue_router
+from app.routers.job import router as job_router
+from app.routers.live import router as live_router
 from app.routers.search import router as search_router
 from app.routers.sprint import router as sprint_router
+from app.routers.sync import router as sync_router
 from app.routers.workplace import router as workplace_router
 
 list_of_routes = [
@@ -14,6 +18,10 @@ list_of_routes = [
     comment_router,
     files_router,
     search_router,
+    sync_router,
+    live_router,
+    job_router,
+    internal_router,
 ]
 
 
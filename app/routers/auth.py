@@ -1,59 +1,65 @@
 import json
-import pathlib
+from typing import Optional
 
-from fastapi import APIRouter, BackgroundTasks, Body, Depends, Request, status
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, Query, Request, status
+from fastapi.responses import RedirectResponse, Response
 
-from app.auth.hash import get_password_hash, verify_password
+from app.auth.hash import hasher
 from app.auth.jwt_token import create_access_token, create_refresh_token
+from app.auth.membership import collect_roles
 from app.auth.oauth2 import get_current_user
 from app.config import client_api_settings
+from app.core.autocomplete import member_directory
 from app.core.avatar import create_avatar
+from app.core.comments import comment_authors
 from app.core.email import Email
 from app.core.exceptions import EmailVerificationException, UserFoundException
 from app.core.redis_session import Redis
-from app.core.storage import get_avatar_storage
 from app.schemas.documents import User
-from app.schemas.models import SuccessfulResponse
+from app.schemas.models import SuccessfulResponse, UserUpdate
 from app.schemas.models.auth import Token, TokenData, UserLogin, UserRegister
 
 router = APIRouter(tags=["Auth"])
 
 
+async def issue_tokens(user: User) -> Token:
+    roles = await collect_roles(user.id)
+    access_token = create_access_token(TokenData(email=user.email, id=user.id, roles=roles, ver=user.token_version))
+    refresh_token = create_refresh_token(TokenData(email=user.email, id=user.id, ver=user.token_version))
+    return Token(access_token=access_token, refresh_token=refresh_token)
+
+
 @router.post("/login", response_model=Token, status_code=status.HTTP_200_OK)
 async def login(user_auth: UserLogin = Body(...)):
     """Authenticates and returns the user's JWT"""
     user = await User.by_email(user_auth.email)
     if not user:
         raise UserFoundException("Юзера нет")
-    if not verify_password(user_auth.password, user.password):
+    valid, new_hash = await hasher.verify_and_update(user_auth.password, user.password)
+    if not valid:
         raise UserFoundException("не правильный логин или пароль")
-    access_token = create_access_token(TokenData(email=user.email))
-    refresh_token = create_refresh_token(TokenData(email=user.email))
-    return Token(access_token=access_token, refresh_token=refresh_token)
+    if new_hash is not None:
+        await user.update({"$set": {"password": new_hash}})
+    return await issue_tokens(user)
 
 
 @router.post("/refresh/", response_model=Token, status_code=status.HTTP_200_OK)
 async def refresh_token(user: User = Depends(get_current_user)):
-    access_token = create_access_token(TokenData(email=user.email))
-    refresh_token = create_refresh_token(TokenData(email=user.email))
-
-    return Token(access_token=access_token, refresh_token=refresh_token)
+    return await issue_tokens(user)
 
 
 @router.post("/register", response_model=SuccessfulResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_register: UserRegister,
     request: Request,
-    background_tasks: BackgroundTasks,
     redis: Redis = Depends(Redis),
     email: Email = Depends(Email),
 ):
     user = await User.by_email(user_register.email)
     if user is not None:
         raise UserFoundException("Юзер уже существует")
-    # Отправка на почту
-    background_tasks.add_task(email.send_registration_mail, request, redis, user_register)
+    # Письмо уходит через очередь, которую разбирает app.mail_worker
+    await email.send_registration_mail(request, redis, user_register)
     return SuccessfulResponse()
 
 
@@ -63,7 +69,7 @@ async def verify_email(token: str, redis: Redis = Depends(Redis)):
     if check is None:
         raise EmailVerificationException("Произошла ошибка! Истекло время или неправильный код")
     user_data = json.loads(check)
-    hashed = get_password_hash(user_data["password"])
+    hashed = await hasher.hash(user_data["password"])
     user = User(email=user_data["email"], password=hashed, name=user_data["name"])
     await create_avatar(str(user.id))
     user.avatar_url = "/file/" + str(user.id) + ".png"
@@ -76,10 +82,18 @@ async def get_user_profile(user: User = Depends(get_current_user)):
     return user
 
 
-@router.get("/profile/avatar", response_class=FileResponse, status_code=status.HTTP_200_OK)
-async def get_user_avatar(user: User = Depends(get_current_user)):
-    avatar_folder = get_avatar_storage()
-    avatar_path = avatar_folder.joinpath(pathlib.Path(str(user.id) + ".png"))
-    if not pathlib.Path.is_file(avatar_path):
-        await create_avatar(str(user.id))
-    return FileResponse(avatar_path)
+@router.put("/profile/", response_model=User, response_model_by_alias=False, status_code=status.HTTP_200_OK)
+async def edit_user_profile(
+    background_tasks: BackgroundTasks, user_update: UserUpdate = Body(...), user: User = Depends(get_current_user)
+):
+    await user.update({"$set": user_update.model_dump()})
+    await member_directory.refresh_user(user.id)
+    background_tasks.add_task(comment_authors.refresh_user, user.id)
+    return user
+
+
+@router.get("/profile/avatar", response_class=Response, status_code=status.HTTP_200_OK)
+async def get_user_avatar(
+    request: Request, size: Optional[int] = Query(default=None, gt=0), user: User = Depends(get_current_user)
+):
+    return await create_avatar.response(request, str(user.id), size, private=True)
@@ -1,13 +1,20 @@
-from typing import List
+from typing import Literal
 from uuid import UUID
 
-from beanie import WriteRules
-from fastapi import APIRouter, Body, Depends, Path, status
+from beanie.operators import NotIn
+from bson import DBRef
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from pymongo import ASCENDING, DESCENDING
 
 from app.auth.oauth2 import guest, member
+from app.core.comments import comment_authors
+from app.core.deleted_sprints import deleted_sprints
 from app.core.exceptions import CommentNotFoundError, IssueNotFoundError
-from app.schemas.documents import Comment, Issue, UserAssignedWorkplace
+from app.core.live import live_hub
+from app.core.pagination import keyset_page
+from app.schemas.documents import Comment, Issue, UserAssignedWorkplace, WorkplaceSequence
 from app.schemas.models import CommentCreation, CommentUpdate, CreationResponse, SuccessfulResponse
+from app.schemas.models.responses import CommentPage, CommentSummary
 
 router = APIRouter(tags=["Comment"])
 
@@ -21,18 +28,36 @@ async def create_comment(
     issue_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(member),
 ):
-    issue = await Issue.find_one(Issue.id == issue_id, Issue.workplace_id == workplace_id, fetch_links=True)
+    # задачи удаляемого спринта скоро удалит CascadeJob, комментарии к ним не принимаются
+    issue = await Issue.get_motor_collection().find_one(
+        {"_id": issue_id, "workplace_id": workplace_id, "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)}},
+        projection={"sprint_id": 1},
+    )
     if issue is None:
         raise IssueNotFoundError("Указанная задача не найдена.")
     comment = Comment(
         **comment_creation.model_dump(),
         author=user,
         issue_id=issue_id,
-        sprint_id=issue.sprint_id,
-        workplace_id=workplace_id
+        sprint_id=issue["sprint_id"],
+        workplace_id=workplace_id,
+        author_snapshot=await comment_authors.snapshot(user)
+    )
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        comment.seq = seq
+        await comment.insert()
+    # ссылка дописывается в задачу без её чтения, поэтому цена не зависит от числа комментариев;
+    # комментарий уже записан, так что ссылка никогда не указывает на несуществующий документ
+    linked = await Issue.get_motor_collection().update_one(
+        {"_id": issue_id}, {"$push": {"comments": DBRef(Comment.get_motor_collection().name, comment.id)}}
+    )
+    if linked.matched_count == 0:
+        # задачу удалили, пока писался комментарий
+        await comment.delete()
+        raise IssueNotFoundError("Указанная задача не найдена.")
+    await live_hub.publish(
+        workplace_id, "comment.created", [comment.id], [issue["sprint_id"]], issue_id=issue_id, seq=comment.seq
     )
-    issue.comments.append(comment)
-    await issue.save(link_rule=WriteRules.WRITE)
     return CreationResponse(id=comment.id)
 
 
@@ -45,7 +70,12 @@ async def create_comment(
 async def get_comment(
     comment_id: UUID = Path(...), workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
 ):
-    comment = await Comment.find_one(Comment.id == comment_id, Issue.workplace_id == workplace_id, fetch_links=True)
+    comment = await Comment.find_one(
+        Comment.id == comment_id,
+        Comment.workplace_id == workplace_id,
+        NotIn(Comment.sprint_id, await deleted_sprints.ids(workplace_id)),
+        fetch_links=True,
+    )
     if comment is None:
         raise CommentNotFoundError("Такого комментария не найдено.")
     return comment
@@ -53,17 +83,32 @@ async def get_comment(
 
 @router.get(
     "/{workplace_id}/issues/{issue_id}/comments",
-    response_model=List[Comment],
+    response_model=CommentPage,
     response_model_by_alias=False,
     status_code=status.HTTP_200_OK,
 )
 async def get_issue_comments(
-    workplace_id: UUID = Path(...), issue_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
+    workplace_id: UUID = Path(...),
+    issue_id: UUID = Path(...),
+    order: Literal["newest", "oldest"] = "newest",
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: UserAssignedWorkplace = Depends(guest),
 ):
-    comments = await Comment.find(
-        Comment.issue_id == issue_id, Comment.workplace_id == workplace_id, fetch_links=True
-    ).to_list()
-    return comments
+    documents, next_cursor = await keyset_page(
+        Comment.get_motor_collection(),
+        {
+            "issue_id": issue_id,
+            "workplace_id": workplace_id,
+            "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)},
+        },
+        CommentSummary.projection,
+        "creation_date",
+        DESCENDING if order == "newest" else ASCENDING,
+        cursor,
+        limit,
+    )
+    return CommentPage(items=[CommentSummary.model_validate(d) for d in documents], next_cursor=next_cursor)
 
 
 @router.put(
@@ -77,10 +122,19 @@ async def edit_comment(
     comment_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(member),
 ):
-    comment = await Comment.find_one(Comment.id == comment_id, Comment.workplace_id == workplace_id, fetch_links=True)
+    comment = await Comment.find_one(
+        Comment.id == comment_id,
+        Comment.workplace_id == workplace_id,
+        NotIn(Comment.sprint_id, await deleted_sprints.ids(workplace_id)),
+        fetch_links=True,
+    )
     if comment is None:
         raise CommentNotFoundError("Такого комментария не найдено.")
-    await comment.update({"$set": comment_update.model_dump(exclude_none=True)})
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        await comment.update({"$set": {**comment_update.model_dump(exclude_none=True), "seq": seq}})
+    await live_hub.publish(
+        workplace_id, "comment.updated", [comment_id], [comment.sprint_id], issue_id=comment.issue_id, seq=seq
+    )
     return SuccessfulResponse()
 
 
@@ -92,8 +146,11 @@ async def edit_comment(
 async def delete_comment(
     workplace_id: UUID = Path(...), comment_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(member)
 ):
-    comment = await Comment.find_one(Comment.id == comment_id, Comment.workplace_id == workplace_id, fetch_links=True)
+    comment = await Comment.find_one(Comment.id == comment_id, Comment.workplace_id == workplace_id)
     if comment is None:
         raise CommentNotFoundError("Такого комментария не найдено.")
     await comment.delete()
+    await live_hub.publish(
+        workplace_id, "comment.deleted", [comment_id], [comment.sprint_id], issue_id=comment.issue_id
+    )
     return None
@@ -1,16 +1,22 @@
+import mimetypes
 import pathlib
+from typing import Literal, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Path, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Body, Depends, Header, Path, Query, Request, UploadFile, status
+from fastapi.responses import Response
 
 from app.auth.oauth2 import member
 from app.core.avatar import create_avatar
+from app.core.blobs import blob_store
 from app.core.download import downloader
 from app.core.exceptions import WorkplaceFileNotFoundException
-from app.core.storage import get_avatar_storage, get_workplace_storage
+from app.core.ranges import ranged_file_response
+from app.core.storage import get_workplace_storage
+from app.core.thumbnails import thumbnails
+from app.core.uploads import resumable_uploads
 from app.schemas.documents import UserAssignedWorkplace
-from app.schemas.models import FileModelOut
+from app.schemas.models import FileModelOut, UploadCreation, UploadSessionOut
 
 router = APIRouter(tags=["Files"])
 
@@ -21,24 +27,91 @@ async def add_file(
     workplace_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(member),
 ):
-    filename: str = await downloader(file_to_upload, workplace_id)
-    file_url = f"/workplaces/{workplace_id}/file/{filename}"
-    return FileModelOut(url=file_url)
+    stored = await downloader(file_to_upload, workplace_id)
+    file_url = f"/workplaces/{workplace_id}/file/{stored.filename}"
+    return FileModelOut(url=file_url, size=stored.size, hash=stored.hash)
 
 
-@router.get("/workplaces/{workplace_id}/file/{filename}", status_code=status.HTTP_200_OK, response_class=FileResponse)
-async def get_file(workplace_id: UUID = Path(...), filename: str = Path(...)):
+@router.get("/workplaces/{workplace_id}/file/{filename}", status_code=status.HTTP_200_OK, response_class=Response)
+async def get_file(
+    request: Request,
+    workplace_id: UUID = Path(...),
+    filename: str = Path(...),
+    variant: Optional[Literal["thumb"]] = Query(default=None),
+    size: Optional[int] = Query(default=None, gt=0),
+):
+    workplace_file = await blob_store.get(workplace_id, filename)
+    if workplace_file is not None:
+        blob_path = blob_store.path(workplace_file.blob_id)
+        if variant == "thumb" and thumbnails.accepts(workplace_file.name, workplace_file.content_type):
+            thumbnail_path = await thumbnails.variant(workplace_file.blob_id, blob_path, size)
+            # пока превью не готово, отдаём оригинал
+            if thumbnail_path is not None:
+                return await ranged_file_response(
+                    request,
+                    thumbnail_path,
+                    thumbnails.media_type,
+                    etag=f'"{workplace_file.blob_id}-{thumbnail_path.stem}"',
+                )
+        return await ranged_file_response(
+            request,
+            blob_path,
+            blob_store.media_type(workplace_file),
+            etag=f'"{workplace_file.blob_id}"',
+        )
+    # файлы, загруженные до перехода на хранилище по содержимому
     local_storage = get_workplace_storage()
     path_file = local_storage.joinpath(pathlib.Path(f"{workplace_id}/{filename}"))
     if not pathlib.Path.is_file(path_file):
         raise WorkplaceFileNotFoundException("Файл не найден")
-    return FileResponse(path_file)
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return await ranged_file_response(request, path_file, media_type)
+
+
+@router.post("/workplaces/{workplace_id}/uploads", status_code=status.HTTP_201_CREATED, response_model=UploadSessionOut)
+async def create_upload(
+    upload_creation: UploadCreation = Body(...),
+    workplace_id: UUID = Path(...),
+    user: UserAssignedWorkplace = Depends(member),
+):
+    return await resumable_uploads.create(workplace_id, upload_creation)
+
+
+@router.get(
+    "/workplaces/{workplace_id}/uploads/{upload_id}", status_code=status.HTTP_200_OK, response_model=UploadSessionOut
+)
+async def get_upload(
+    workplace_id: UUID = Path(...), upload_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(member)
+):
+    return await resumable_uploads.status(workplace_id, upload_id)
+
+
+@router.patch(
+    "/workplaces/{workplace_id}/uploads/{upload_id}", status_code=status.HTTP_200_OK, response_model=UploadSessionOut
+)
+async def upload_chunk(
+    request: Request,
+    upload_offset: int = Header(..., ge=0),
+    workplace_id: UUID = Path(...),
+    upload_id: UUID = Path(...),
+    user: UserAssignedWorkplace = Depends(member),
+):
+    return await resumable_uploads.append(workplace_id, upload_id, upload_offset, request.stream())
+
+
+@router.post(
+    "/workplaces/{workplace_id}/uploads/{upload_id}/finalize",
+    status_code=status.HTTP_201_CREATED,
+    response_model=FileModelOut,
+)
+async def finalize_upload(
+    workplace_id: UUID = Path(...), upload_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(member)
+):
+    stored = await resumable_uploads.finalize(workplace_id, upload_id)
+    file_url = f"/workplaces/{workplace_id}/file/{stored.filename}"
+    return FileModelOut(url=file_url, size=stored.size, hash=stored.hash)
 
 
-@router.get("/file/{filename}", status_code=status.HTTP_200_OK, response_class=FileResponse)
-async def get_avatar(filename: str = Path()):
-    avatar_folder = get_avatar_storage()
-    avatar_path = avatar_folder.joinpath(pathlib.Path(filename))
-    if not pathlib.Path.is_file(avatar_path):
-        await create_avatar(filename[:-4])
-    return FileResponse(avatar_path)
+@router.get("/file/{filename}", status_code=status.HTTP_200_OK, response_class=Response)
+async def get_avatar(request: Request, filename: str = Path(), size: Optional[int] = Query(default=None, gt=0)):
+    return await create_avatar.response(request, pathlib.Path(filename).stem, size)
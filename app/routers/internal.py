@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, status
+
+from app.auth.membership import membership_cache
+from app.auth.oauth2 import operator
+from app.schemas.models import CacheStats
+
+router = APIRouter(prefix="/internal", tags=["Internal"], include_in_schema=False, dependencies=[Depends(operator)])
+
+
+# Статистика локального кэша членств этого процесса
+@router.get("/cache/membership", response_model=CacheStats, status_code=status.HTTP_200_OK)
+async def get_membership_cache_stats():
+    return membership_cache.stats()
@@ -1,19 +1,38 @@
-from typing import List
+from collections import Counter
+from typing import Dict, List
 from uuid import UUID
 
-from asyncstdlib import list as alist
-from asyncstdlib import map as amap
-from beanie import WriteRules
-from beanie.operators import Set
-from fastapi import APIRouter, Body, Depends, Path, status
+from beanie.operators import NotIn
+from bson import DBRef
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from app.auth.oauth2 import guest, member
-from app.core.exceptions import IssueNotFoundError, SprintNotFoundError, UserNotFoundError, ValidationError
-from app.schemas.documents import Comment, Issue, Sprint, UserAssignedWorkplace
-from app.schemas.models import CreationResponse, IssueCreation, IssueUpdate, SuccessfulResponse
+from app.core.deleted_sprints import deleted_sprints
+from app.core.exceptions import ConflictException, IssueNotFoundError, SprintNotFoundError, ValidationError
+from app.core.live import live_hub
+from app.core.members import member_resolver
+from app.core.mongo_session import run_in_transaction
+from app.core.pagination import keyset_page
+from app.core.stats import FIELDS, sprint_statistics
+from app.schemas.documents import Comment, Issue, Sprint, UserAssignedWorkplace, WorkplaceSequence
+from app.schemas.models import (
+    CreationResponse,
+    IssueBulkItem,
+    IssueBulkResult,
+    IssueBulkUpdate,
+    IssueCreation,
+    IssueFilter,
+    IssueUpdate,
+    SuccessfulResponse,
+)
+from app.schemas.models.responses import IssuePage, IssueSummary
 
 router = APIRouter(tags=["Issue"])
 
+STATS_PROJECTION = {"sprint_id": 1, "state": 1, "priority": 1, "label": 1}
+
 
 @router.post("/{workplace_id}/issues", response_model=CreationResponse, status_code=status.HTTP_201_CREATED)
 async def create_issue(
@@ -21,17 +40,10 @@ async def create_issue(
     workplace_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(member),
 ):
-    sprint = await Sprint.find_one(
-        Sprint.workplace_id == workplace_id, Sprint.id == issue_creation.sprint_id, fetch_links=True
-    )
+    sprint = await Sprint.by_id(workplace_id, issue_creation.sprint_id)
     if sprint is None:
         raise SprintNotFoundError("Нет такого спринта")
-    workplace = sprint.workplace
-    implementers = await alist(amap(lambda id: UserAssignedWorkplace.get(id), issue_creation.implementers))
-    if len(implementers) != len(issue_creation.implementers):
-        raise UserNotFoundError("Пользователь не найден в воркплейсе")
-    if not set(implementers).issubset(workplace.users):
-        raise ValidationError("Пользователь не принадлежит worplace")
+    implementers = await member_resolver.resolve(workplace_id, issue_creation.implementers)
     issue = Issue(
         **issue_creation.model_dump(exclude={"implementers"}),
         author=user,
@@ -39,8 +51,23 @@ async def create_issue(
         workplace_id=workplace_id,
     )
     issue.validate_creation()
-    sprint.issues.append(issue)
-    await sprint.save(link_rule=WriteRules.WRITE)
+
+    async def write(session=None):
+        await issue.insert(session=session)
+        # спринт получает только ссылку и не перезаписывается целиком
+        await Sprint.get_motor_collection().update_one(
+            {"_id": sprint.id},
+            {"$push": {"issues": DBRef(Issue.get_motor_collection().name, issue.id)}},
+            session=session,
+        )
+        await sprint_statistics.apply(
+            workplace_id, {sprint.id: sprint_statistics.delta(issue.model_dump(include=set(FIELDS)), 1)}, session
+        )
+
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        issue.seq = seq
+        await run_in_transaction(Issue.get_motor_collection().database.client, write)
+    await live_hub.publish(workplace_id, "issue.created", [issue.id], [sprint.id], seq=issue.seq)
     return CreationResponse(id=issue.id)
 
 
@@ -53,33 +80,77 @@ async def create_issue(
 async def get_issue(
     workplace_id: UUID = Path(...), issue_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
 ):
-    issue = await Issue.find_one(Issue.id == issue_id, Issue.workplace_id == workplace_id, fetch_links=True)
+    issue = await Issue.find_one(
+        Issue.id == issue_id,
+        Issue.workplace_id == workplace_id,
+        NotIn(Issue.sprint_id, await deleted_sprints.ids(workplace_id)),
+        fetch_links=True,
+    )
     if issue is None:
         raise IssueNotFoundError("Такой задачи не найдено.")
     return issue
 
 
+async def list_issues(query: dict, cursor: str | None, limit: int) -> IssuePage:
+    documents, next_cursor = await keyset_page(
+        Issue.get_motor_collection(), query, IssueSummary.projection, "creation_date", DESCENDING, cursor, limit
+    )
+    return IssuePage(items=[IssueSummary.model_validate(d) for d in documents], next_cursor=next_cursor)
+
+
 @router.get(
     "/{workplace_id}/sprints/{sprint_id}/issues",
-    response_model=List[Issue],
+    response_model=IssuePage,
     response_model_by_alias=False,
     status_code=status.HTTP_200_OK,
 )
 async def get_sprint_issues(
-    workplace_id: UUID = Path(...), sprint_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID = Path(...),
+    filters: IssueFilter = Depends(),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: UserAssignedWorkplace = Depends(guest),
 ):
-    sprint = await Sprint.find_one(Sprint.workplace_id == workplace_id, Sprint.id == sprint_id, fetch_links=True)
+    sprint = await Sprint.by_id(workplace_id, sprint_id)
     if sprint is None:
         raise SprintNotFoundError("Нет такого спринта")
-    return sprint.issues
+    return await list_issues({**filters.query(), "sprint_id": sprint_id}, cursor, limit)
 
 
 @router.get(
-    "/{workplace_id}/issues", response_model=List[Issue], response_model_by_alias=False, status_code=status.HTTP_200_OK
+    "/{workplace_id}/issues", response_model=IssuePage, response_model_by_alias=False, status_code=status.HTTP_200_OK
 )
-async def get_workplace_issues(workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)):
-    issues = await Issue.find(Issue.workplace_id == workplace_id, fetch_links=True).to_list()
-    return issues
+async def get_workplace_issues(
+    workplace_id: UUID = Path(...),
+    filters: IssueFilter = Depends(),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: UserAssignedWorkplace = Depends(guest),
+):
+    query = {
+        **filters.query(),
+        "workplace_id": workplace_id,
+        "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)},
+    }
+    return await list_issues(query, cursor, limit)
+
+
+async def relink_issues(moved: Dict[UUID, List[UUID]], sprint_id: UUID, session=None) -> None:
+    """Moves issue links from their old sprints to the new one and cascades sprint_id to the comments."""
+    collection = Issue.get_motor_collection().name
+    operations = [
+        UpdateOne({"_id": old_sprint_id}, {"$pull": {"issues": {"$in": [DBRef(collection, id) for id in ids]}}})
+        for old_sprint_id, ids in moved.items()
+    ]
+    issue_ids = [id for ids in moved.values() for id in ids]
+    operations.append(
+        UpdateOne({"_id": sprint_id}, {"$push": {"issues": {"$each": [DBRef(collection, id) for id in issue_ids]}}})
+    )
+    await Sprint.get_motor_collection().bulk_write(operations, ordered=True, session=session)
+    await Comment.get_motor_collection().update_many(
+        {"issue_id": {"$in": issue_ids}}, {"$set": {"sprint_id": sprint_id}}, session=session
+    )
 
 
 @router.put("/{workplace_id}/issues/{issue_id}", response_model=SuccessfulResponse, status_code=status.HTTP_200_OK)
@@ -89,40 +160,165 @@ async def edit_issue(
     issue_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(member),
 ):
-    issue = await Issue.find_one(Issue.id == issue_id, Issue.workplace_id == workplace_id, fetch_links=True)
-    if issue is None:
-        raise IssueNotFoundError("Такой задачи не найдено.")
-    issue.end_date = issue_update.end_date
-    issue.validate_creation()
+    changes = issue_update.model_dump(exclude={"implementers", "revision"}, exclude_none=True)
+    changes["end_date"] = issue_update.end_date
     if issue_update.implementers is not None:
-        implementers = await alist(amap(lambda id: UserAssignedWorkplace.get(id), issue_update.implementers))
-        if len(implementers) != len(issue_update.implementers):
-            raise UserNotFoundError("Пользователь не найден в воркплейсе")
-        if not set(implementers).issubset(issue.sprint.workplace.users):
-            raise ValidationError("Пользователь не принадлежит worplace")
-        issue.implementers = implementers
-    if issue_update.sprint_id is not None and issue_update.sprint_id != issue.sprint_id:
-        sprint = await Sprint.find_one(
-            Sprint.workplace_id == workplace_id, Sprint.id == issue_update.sprint_id, fetch_links=False
-        )  # именно False!
+        implementers = await member_resolver.resolve(workplace_id, issue_update.implementers)
+        collection = UserAssignedWorkplace.get_motor_collection().name
+        changes["implementers"] = [DBRef(collection, implementer.id) for implementer in implementers]
+    if issue_update.sprint_id is not None:
+        sprint = await Sprint.by_id(workplace_id, issue_update.sprint_id)
         if sprint is None:
             raise SprintNotFoundError("Нет такого спринта")
-        issue.sprint.issues.remove(issue.id)
-        await issue.sprint.save(link_rule=WriteRules.WRITE)
-        sprint.issues.append(issue)
-        await sprint.save(link_rule=WriteRules.WRITE)
-    await issue.save()
-    await issue.update({"$set": issue_update.model_dump(exclude="implementers", exclude_none=True)})
-    await Comment.find(Comment.issue_id == issue_id).update(Set({Comment.sprint_id: issue.sprint_id}))
+
+    # все проверки выполняются в условии обновления, чтобы запись шла одним запросом;
+    # задачи удаляемого спринта скоро удалит CascadeJob, поэтому их не меняем
+    hidden = await deleted_sprints.ids(workplace_id)
+    query = {"_id": issue_id, "workplace_id": workplace_id, "sprint_id": {"$nin": hidden}}
+    if issue_update.end_date is not None:
+        query["creation_date"] = {"$lte": issue_update.end_date}
+    if issue_update.revision is not None:
+        query["revision"] = issue_update.revision if issue_update.revision else {"$in": [0, None]}
+
+    async def write(session=None):
+        previous = await Issue.get_motor_collection().find_one_and_update(
+            query, {"$set": changes, "$inc": {"revision": 1}}, projection=STATS_PROJECTION, session=session
+        )
+        if previous is None:
+            return None
+        if issue_update.sprint_id not in (None, previous["sprint_id"]):
+            await relink_issues({previous["sprint_id"]: [issue_id]}, issue_update.sprint_id, session)
+        await sprint_statistics.apply(workplace_id, sprint_statistics.changes(previous, changes), session)
+        return previous
+
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        changes["seq"] = seq
+        if issue_update.sprint_id is not None or any(field in changes for field in FIELDS):
+            previous = await run_in_transaction(Issue.get_motor_collection().database.client, write)
+        else:
+            # правка текста, сроков или исполнителей не трогает счётчики, хватает одной записи
+            previous = await write()
+    if previous is None:
+        current = await Issue.get_motor_collection().find_one(
+            {"_id": issue_id, "workplace_id": workplace_id, "sprint_id": {"$nin": hidden}}, {"revision": 1}
+        )
+        if current is None:
+            raise IssueNotFoundError("Такой задачи не найдено.")
+        if issue_update.revision is not None and current.get("revision", 0) != issue_update.revision:
+            raise ConflictException("Задача уже была изменена, обновите её и повторите попытку")
+        raise ValidationError("Нельзя создать задачу задним числом")
+    sprint_ids = [previous["sprint_id"], issue_update.sprint_id or previous["sprint_id"]]
+    await live_hub.publish(workplace_id, "issue.updated", [issue_id], sprint_ids, seq=changes["seq"])
     return SuccessfulResponse()
 
 
+@router.post("/{workplace_id}/issues/bulk", response_model=IssueBulkResult, status_code=status.HTTP_200_OK)
+async def bulk_edit_issues(
+    bulk_update: IssueBulkUpdate = Body(...),
+    workplace_id: UUID = Path(...),
+    user: UserAssignedWorkplace = Depends(member),
+):
+    changes = bulk_update.model_dump(include={"priority", "state", "label", "sprint_id"}, exclude_none=True)
+    if not changes and bulk_update.implementers is None:
+        raise ValidationError("Не указано ни одного изменения")
+    if bulk_update.sprint_id is not None:
+        sprint = await Sprint.by_id(workplace_id, bulk_update.sprint_id)
+        if sprint is None:
+            raise SprintNotFoundError("Нет такого спринта")
+    if bulk_update.implementers is not None:
+        implementers = await member_resolver.resolve(workplace_id, bulk_update.implementers)
+        collection = UserAssignedWorkplace.get_motor_collection().name
+        changes["implementers"] = [DBRef(collection, implementer.id) for implementer in implementers]
+
+    ids = list(dict.fromkeys(bulk_update.ids))
+    # задачи удаляемых спринтов считаются уже удалёнными
+    live = {"workplace_id": workplace_id, "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)}}
+    previous = {
+        document["_id"]: document
+        async for document in Issue.get_motor_collection().find({"_id": {"$in": ids}, **live}, STATS_PROJECTION)
+    }
+    found = {id: document["sprint_id"] for id, document in previous.items()}
+    targets = [id for id in ids if id in found]
+    results = {id: IssueBulkItem(id=id, status="updated" if id in found else "not_found") for id in ids}
+    if not targets:
+        return IssueBulkResult(updated=0, results=list(results.values()))
+
+    failed: Dict[UUID, str] = {}
+
+    async def write(session=None):
+        failed.clear()
+        # прежние значения перечитываются в транзакции, чтобы счётчики не разошлись с параллельной правкой
+        before = {
+            document["_id"]: document
+            async for document in Issue.get_motor_collection().find(
+                {"_id": {"$in": targets}, **live}, STATS_PROJECTION, session=session
+            )
+        }
+        operations = [UpdateOne({"_id": id, **live}, {"$set": changes, "$inc": {"revision": 1}}) for id in targets]
+        try:
+            await Issue.get_motor_collection().bulk_write(operations, ordered=False, session=session)
+        except BulkWriteError as error:
+            for write_error in error.details["writeErrors"]:
+                failed[targets[write_error["index"]]] = write_error["errmsg"]
+            # в транзакции ошибка записи отменяет всю пачку
+            if session is not None:
+                raise
+        updated = [id for id in targets if id in before and id not in failed]
+
+        moved: Dict[UUID, List[UUID]] = {}
+        for id in updated:
+            if bulk_update.sprint_id is not None and before[id]["sprint_id"] != bulk_update.sprint_id:
+                moved.setdefault(before[id]["sprint_id"], []).append(id)
+        if moved:
+            await relink_issues(moved, bulk_update.sprint_id, session)
+        deltas: Dict[UUID, Counter] = {}
+        for id in updated:
+            for sprint_id, counter in sprint_statistics.changes(before[id], changes).items():
+                deltas.setdefault(sprint_id, Counter()).update(counter)
+        await sprint_statistics.apply(workplace_id, deltas, session)
+        return updated
+
+    aborted = False
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        changes["seq"] = seq
+        try:
+            updated = await run_in_transaction(Issue.get_motor_collection().database.client, write)
+        except BulkWriteError:
+            updated, aborted = [], True
+    for id in targets:
+        if id in failed or aborted:
+            error = failed.get(id, "Изменение отменено из-за ошибки в другой задаче пачки")
+            results[id] = IssueBulkItem(id=id, status="failed", error=error)
+        elif id not in updated:
+            # задачу удалили между проверкой и записью
+            results[id] = IssueBulkItem(id=id, status="not_found")
+    if updated:
+        sprint_ids = [found[id] for id in updated]
+        if bulk_update.sprint_id is not None:
+            sprint_ids.append(bulk_update.sprint_id)
+        await live_hub.publish(workplace_id, "issue.updated", updated, sprint_ids, seq=changes["seq"])
+    return IssueBulkResult(updated=len(updated), results=list(results.values()))
+
+
 @router.delete("/{workplace_id}/issues/{issue_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
 async def delete_issue(
     workplace_id: UUID = Path(...), issue_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(member)
 ):
-    issue = await Issue.find_one(Issue.id == issue_id, Issue.workplace_id == workplace_id, fetch_links=True)
+    # задача читается в транзакции, чтобы счётчики уменьшились ровно на удалённое состояние
+    async def write(session=None):
+        issue = await Issue.find_one(Issue.id == issue_id, Issue.workplace_id == workplace_id, session=session)
+        if issue is None:
+            return None
+        await issue.delete_with_refs(seq, session)
+        await sprint_statistics.apply(
+            workplace_id, {issue.sprint_id: sprint_statistics.delta(issue.model_dump(include=set(FIELDS)), -1)}, session
+        )
+        return issue
+
+    # номер выдаётся вне транзакции, чтобы лента синхронизации ждала её завершения
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        issue = await run_in_transaction(Issue.get_motor_collection().database.client, write)
     if issue is None:
         raise IssueNotFoundError("Такой задачи не найдено.")
-    await issue.delete()
+    await live_hub.publish(workplace_id, "issue.deleted", [issue_id], [issue.sprint_id])
     return None
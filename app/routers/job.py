@@ -0,0 +1,19 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Path, status
+
+from app.auth.oauth2 import get_current_user
+from app.core.exceptions import JobNotFoundError
+from app.schemas.documents import CascadeJob, User
+from app.schemas.models.responses import CascadeJobStatus
+
+router = APIRouter(tags=["Job"])
+
+
+@router.get("/jobs/{job_id}", response_model=CascadeJobStatus, status_code=status.HTTP_200_OK)
+async def get_job(job_id: UUID = Path(...), user: User = Depends(get_current_user)):
+    # после удаления workplace членства уже нет, поэтому задачу видит тот, кто её запустил
+    job = await CascadeJob.find_one(CascadeJob.id == job_id, CascadeJob.requested_by == user.id)
+    if job is None:
+        raise JobNotFoundError("Такой задачи удаления не найдено.")
+    return CascadeJobStatus.model_validate(job.model_dump())
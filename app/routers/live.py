@@ -0,0 +1,83 @@
+import asyncio
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Path, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.auth.oauth2 import connection_guest, get_connection_token_data
+from app.config import live_settings
+from app.core.exceptions import CommonException
+from app.core.live import RESYNC, live_hub
+from app.schemas.documents import UserAssignedWorkplace
+
+router = APIRouter(tags=["Live"])
+
+
+# Изменения воркплейса (или одного спринта) в реальном времени
+@router.websocket("/{workplace_id}/live")
+async def live_websocket(
+    websocket: WebSocket,
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID | None = Query(default=None),
+    token: str | None = Query(default=None),
+):
+    try:
+        await connection_guest(await get_connection_token_data(websocket, token), workplace_id)
+    except CommonException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = live_hub.subscribe(workplace_id, sprint_id)
+
+    async def send() -> None:
+        while True:
+            message = await subscriber.next(live_settings.LIVE_HEARTBEAT)
+            if message == "":
+                continue
+            await asyncio.wait_for(websocket.send_text(message or RESYNC), live_settings.LIVE_SEND_TIMEOUT)
+            if message is None:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+
+    async def receive() -> None:
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # отключение клиента или таймаут отправки просто завершают соединение
+            if task.exception() is not None and not isinstance(
+                task.exception(), (WebSocketDisconnect, asyncio.TimeoutError)
+            ):
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        live_hub.unsubscribe(subscriber)
+
+
+@router.get("/{workplace_id}/live/events", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def live_events(
+    request: Request,
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID | None = Query(default=None),
+    user: UserAssignedWorkplace = Depends(connection_guest),
+):
+    subscriber = live_hub.subscribe(workplace_id, sprint_id)
+
+    async def stream():
+        try:
+            while True:
+                message = await subscriber.next(live_settings.LIVE_HEARTBEAT)
+                if message == "":
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {message or RESYNC}\n\n"
+                if message is None:
+                    return
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
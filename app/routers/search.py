@@ -1,57 +1,78 @@
 from typing import List
 from uuid import UUID
 
-from beanie.operators import RegEx
-from fastapi import APIRouter, Depends, Path, status
+from fastapi import APIRouter, Depends, Path, Query, status
+from pymongo import ASCENDING
 
 from app.auth.oauth2 import member
+from app.config import cache_settings
+from app.core.autocomplete import member_directory
+from app.core.deleted_sprints import deleted_sprints
+from app.core.pagination import keyset_page
+from app.core.search import issue_search
 from app.schemas.documents import Issue, UserAssignedWorkplace
+from app.schemas.models import IssueFilter
+from app.schemas.models.responses import IssuePage, IssueSearchPage, IssueSummary, WorkplaceMember
+from app.schemas.types import Label, Priority, State
 
 router = APIRouter(tags=["Search"])
 
 
-# Поиск пользователей в данном воркплейсе по строке
+# Поиск пользователей в данном воркплейсе по началу имени или почты
 @router.get(
     "/{workplace_id}/search/users",
-    response_model=List[UserAssignedWorkplace],
-    response_model_by_alias=False,
+    response_model=List[WorkplaceMember],
     status_code=status.HTTP_200_OK,
 )
 async def search_users(
-    workplace_id: UUID = Path(...), searching_string: str | None = "", user: UserAssignedWorkplace = Depends(member)
+    workplace_id: UUID = Path(...),
+    searching_string: str | None = "",
+    limit: int = Query(default=cache_settings.AUTOCOMPLETE_LIMIT, ge=1, le=100),
+    user: UserAssignedWorkplace = Depends(member),
 ):
-    users = await UserAssignedWorkplace.find(
-        UserAssignedWorkplace.workplace_id == workplace_id,
-        RegEx(UserAssignedWorkplace.user.name, "^" + searching_string),
-        fetch_links=True,
-    ).to_list()
-    return users
+    return await member_directory.search(workplace_id, searching_string or "", limit)
 
 
-# Поиск задач в данном воркплейсе по строке
+# Полнотекстовый поиск задач в данном воркплейсе по названию, описанию и комментариям
 @router.get(
     "/{workplace_id}/search/issues",
-    response_model=List[Issue],
+    response_model=IssueSearchPage,
     response_model_by_alias=False,
     status_code=status.HTTP_200_OK,
 )
 async def search_issues(
-    workplace_id: UUID = Path(...), searching_string: str | None = "", user: UserAssignedWorkplace = Depends(member)
+    workplace_id: UUID = Path(...),
+    searching_string: str | None = "",
+    page: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+    user: UserAssignedWorkplace = Depends(member),
 ):
-    issues = await Issue.find(
-        Issue.workplace_id == workplace_id, RegEx(Issue.name, "^" + searching_string), fetch_links=True
-    ).to_list()
-    return issues
+    return await issue_search.search(workplace_id, searching_string or "", page, limit)
 
 
 # Поиск всех задач, которые назначены пользователю в этом воркплейсе
 @router.get(
     "/{workplace_id}/search/user/issues",
-    response_model=List[Issue],
+    response_model=IssuePage,
     response_model_by_alias=False,
     status_code=status.HTTP_200_OK,
 )
-async def search_issues_for_user(workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(member)):
-    issues = await Issue.find(Issue.workplace_id == workplace_id, fetch_links=True).to_list()
-    user_issues = [i for i in issues if user in i.implementers]
-    return user_issues
+async def search_issues_for_user(
+    workplace_id: UUID = Path(...),
+    state: State | None = None,
+    priority: Priority | None = None,
+    label: Label | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user: UserAssignedWorkplace = Depends(member),
+):
+    filters = IssueFilter(state=state, priority=priority, label=label, implementer=user.id)
+    query = {
+        **filters.query(),
+        "workplace_id": workplace_id,
+        "sprint_id": {"$nin": await deleted_sprints.ids(workplace_id)},
+    }
+    documents, next_cursor = await keyset_page(
+        Issue.get_motor_collection(), query, IssueSummary.projection, "end_date", ASCENDING, cursor, limit
+    )
+    return IssuePage(items=[IssueSummary.model_validate(d) for d in documents], next_cursor=next_cursor)
@@ -1,14 +1,23 @@
 from typing import List
 from uuid import UUID
 
-from beanie import WriteRules
-from fastapi import APIRouter, Body, Depends, Path, status
+from beanie.operators import NE
+from bson import DBRef
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from pymongo import DESCENDING
 
 from app.auth.oauth2 import admin, guest
-from app.core.exceptions import SprintNotFoundError
-from app.schemas.documents import Sprint, UserAssignedWorkplace, Workplace
+from app.core.board import sprint_board
+from app.core.cascade import cascade_worker
+from app.core.deleted_sprints import deleted_sprints
+from app.core.exceptions import SprintNotFoundError, WorkplaceNotFoundError
+from app.core.live import live_hub
+from app.core.pagination import keyset_page
+from app.core.stats import sprint_statistics
+from app.schemas.documents import Issue, Sprint, Tombstone, UserAssignedWorkplace, Workplace, WorkplaceSequence
 from app.schemas.models import CreationResponse, SprintCreation, SprintUpdate, SuccessfulResponse
-from app.schemas.models.responses import Column, SprintResponse
+from app.schemas.models.responses import Burndown, CascadeJobStatus, IssuePage, IssueSummary, SprintResponse
+from app.schemas.types import State
 
 router = APIRouter(tags=["Sprint"])
 
@@ -20,10 +29,18 @@ async def create_sprint(
     user: UserAssignedWorkplace = Depends(admin),
 ):
     await Sprint.validate_dates(sprint_creation.start_date, sprint_creation.end_date, workplace_id)
-    workplace = await Workplace.find_one(Workplace.id == workplace_id, fetch_links=True)
+    workplace = await Workplace.by_id(workplace_id)
+    if workplace is None:
+        raise WorkplaceNotFoundError("Worplace не найден")
     sprint = Sprint(**sprint_creation.model_dump(), workplace_id=workplace.id)
-    workplace.sprints.append(sprint)
-    await workplace.save(link_rule=WriteRules.WRITE)
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        sprint.seq = seq
+        await sprint.insert()
+    # workplace получает только ссылку, его номер изменения не трогается
+    await Workplace.get_motor_collection().update_one(
+        {"_id": workplace_id}, {"$push": {"sprints": DBRef(Sprint.get_motor_collection().name, sprint.id)}}
+    )
+    await live_hub.publish(workplace_id, "sprint.created", [sprint.id], [sprint.id], seq=sprint.seq)
     return CreationResponse(id=sprint.id)
 
 
@@ -34,13 +51,59 @@ async def create_sprint(
     status_code=status.HTTP_200_OK,
 )
 async def get_sprint(
-    workplace_id: UUID = Path(...), sprint_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID = Path(...),
+    limit: int = Query(default=20, ge=1, le=100),
+    user: UserAssignedWorkplace = Depends(guest),
 ):
-    sprint = await Sprint.find_one(Sprint.id == sprint_id, Sprint.workplace_id == workplace_id, fetch_links=True)
+    sprint = await Sprint.by_id(workplace_id, sprint_id)
     if sprint is None:
         raise SprintNotFoundError("Такого спринта не найдено.")
-    issues = Column.group(sprint.issues)
-    return SprintResponse(**sprint.model_dump(), columns=issues)
+    columns = await sprint_board.columns(sprint_id, limit)
+    return SprintResponse(**sprint.model_dump(), columns=columns)
+
+
+# Следующие карточки одной колонки доски
+@router.get(
+    "/{workplace_id}/sprints/{sprint_id}/columns/{state}",
+    response_model=IssuePage,
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
+)
+async def get_sprint_column(
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID = Path(...),
+    state: State = Path(...),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    user: UserAssignedWorkplace = Depends(guest),
+):
+    sprint = await Sprint.by_id(workplace_id, sprint_id)
+    if sprint is None:
+        raise SprintNotFoundError("Такого спринта не найдено.")
+    documents, next_cursor = await keyset_page(
+        Issue.get_motor_collection(),
+        {"sprint_id": sprint_id, "state": state},
+        IssueSummary.projection,
+        "creation_date",
+        DESCENDING,
+        cursor,
+        limit,
+    )
+    return IssuePage(items=[IssueSummary.model_validate(d) for d in documents], next_cursor=next_cursor)
+
+
+# Счётчики задач спринта по дням
+@router.get("/{workplace_id}/sprints/{sprint_id}/burndown", response_model=Burndown, status_code=status.HTTP_200_OK)
+async def get_sprint_burndown(
+    workplace_id: UUID = Path(...),
+    sprint_id: UUID = Path(...),
+    user: UserAssignedWorkplace = Depends(guest),
+):
+    sprint = await Sprint.by_id(workplace_id, sprint_id)
+    if sprint is None:
+        raise SprintNotFoundError("Такого спринта не найдено.")
+    return await sprint_statistics.burndown(sprint)
 
 
 @router.get(
@@ -53,7 +116,9 @@ async def get_sprints(
     workplace_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(guest),
 ):
-    sprints = await Sprint.find(Sprint.workplace_id == workplace_id, fetch_links=True).to_list()
+    sprints = await Sprint.find(
+        Sprint.workplace_id == workplace_id, NE(Sprint.deleted, True), fetch_links=True
+    ).to_list()
     return sprints
 
 
@@ -64,22 +129,35 @@ async def edit_sprint(
     sprint_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(admin),
 ):
-    sprint = await Sprint.find_one(Sprint.workplace_id == workplace_id, Sprint.id == sprint_id)
+    sprint = await Sprint.by_id(workplace_id, sprint_id)
     if sprint is None:
         raise SprintNotFoundError("Такого спринта не найдено.")
     start_date = sprint.start_date if sprint_update.start_date is None else sprint_update.start_date
     end_date = sprint.end_date if sprint_update.end_date is None else sprint_update.end_date
     await Sprint.validate_dates(start_date, end_date, workplace_id, sprint_id)
-    await sprint.update({"$set": sprint_update.model_dump(exclude_none=True)})
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        await sprint.update({"$set": {**sprint_update.model_dump(exclude_none=True), "seq": seq}})
+    await live_hub.publish(workplace_id, "sprint.updated", [sprint_id], [sprint_id], seq=seq)
     return SuccessfulResponse()
 
 
-@router.delete("/{workplace_id}/sprints/{sprint_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{workplace_id}/sprints/{sprint_id}", response_model=CascadeJobStatus, status_code=status.HTTP_202_ACCEPTED
+)
 async def delete_sprint(
     workplace_id: UUID = Path(...), sprint_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(admin)
 ):
-    sprint = await Sprint.find_one(Sprint.workplace_id == workplace_id, Sprint.id == sprint_id, fetch_links=True)
-    if sprint is None:
+    # спринт скрывается сразу, задачи и комментарии удаляются в фоне
+    result = await Sprint.get_motor_collection().update_one(
+        {"_id": sprint_id, "workplace_id": workplace_id, "deleted": {"$ne": True}}, {"$set": {"deleted": True}}
+    )
+    if result.modified_count == 0:
         raise SprintNotFoundError("Такого спринта не найдено.")
-    await sprint.delete()
-    return None
+    await deleted_sprints.add(workplace_id, sprint_id)
+    await Workplace.get_motor_collection().update_one(
+        {"_id": workplace_id}, {"$pull": {"sprints": DBRef(Sprint.get_motor_collection().name, sprint_id)}}
+    )
+    await Tombstone.record(workplace_id, "sprint", [sprint_id])
+    job = await cascade_worker.enqueue("sprint", sprint_id, workplace_id, user.user.ref.id)
+    await live_hub.publish(workplace_id, "sprint.deleted", [sprint_id], [sprint_id])
+    return CascadeJobStatus.model_validate(job.model_dump())
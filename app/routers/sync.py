@@ -0,0 +1,25 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Path, Query, status
+
+from app.auth.oauth2 import guest
+from app.core.sync import change_feed
+from app.schemas.documents import UserAssignedWorkplace
+from app.schemas.models.responses import Changes
+
+router = APIRouter(tags=["Sync"])
+
+
+# Изменения в воркплейсе после указанного номера; since=0 отдаёт полное состояние
+@router.get(
+    "/{workplace_id}/changes",
+    response_model=Changes,
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
+)
+async def get_changes(
+    workplace_id: UUID = Path(...),
+    since: int = Query(default=0, ge=0),
+    user: UserAssignedWorkplace = Depends(guest),
+):
+    return await change_feed.changes(workplace_id, since)
@@ -2,16 +2,22 @@ from typing import List
 from uuid import UUID, uuid4
 
 from beanie import WriteRules
-from beanie.operators import RegEx
-from fastapi import APIRouter, BackgroundTasks, Body, Depends, Path, Request, status
+from bson import DBRef
+from fastapi import APIRouter, Body, Depends, Path, Query, Request, status
 from fastapi.responses import RedirectResponse
+from pymongo import ASCENDING
 
+from app.auth.membership import invalidate_membership, user_workplace_roles
 from app.auth.oauth2 import admin, get_current_user, guest
 from app.config import client_api_settings
+from app.core.autocomplete import member_directory
+from app.core.cascade import cascade_worker
 from app.core.email import Email
+from app.core.exceptions import WorkplaceNotFoundError
 from app.core.redis_session import Redis
-from app.schemas.documents import Role, User, UserAssignedWorkplace, Workplace
+from app.schemas.documents import Role, User, UserAssignedWorkplace, Workplace, WorkplaceSequence
 from app.schemas.models import CreationResponse, InviteModel, SuccessfulResponse, WorkplaceCreation, WorkplaceUpdate
+from app.schemas.models.responses import CascadeJobStatus, WorkplaceMember, WorkplaceSummary
 
 router = APIRouter(tags=["Workplace"])
 
@@ -20,7 +26,10 @@ router = APIRouter(tags=["Workplace"])
 async def create_workplace(workplace_creation: WorkplaceCreation = Body(...), user: User = Depends(get_current_user)):
     workplace = Workplace(**workplace_creation.model_dump())
     workplace.users = [UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN)]
-    await workplace.save(link_rule=WriteRules.WRITE)
+    async with WorkplaceSequence.stamp(workplace.id) as seq:
+        workplace.seq = seq
+        await workplace.save(link_rule=WriteRules.WRITE)
+    await invalidate_membership(user.id, workplace.id)
     return CreationResponse(id=workplace.id)
 
 
@@ -32,7 +41,9 @@ async def create_workplace(workplace_creation: WorkplaceCreation = Body(...), us
     response_model_exclude={"users"},
 )
 async def get_workplace(workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)):
-    workplace = await Workplace.find_one(Workplace.id == workplace_id, fetch_links=True)
+    workplace = await Workplace.by_id(workplace_id, fetch_links=True)
+    if workplace is None:
+        raise WorkplaceNotFoundError("Worplace не найден")
     return workplace
 
 
@@ -42,43 +53,67 @@ async def edit_workplace(
     workplace_id: UUID = Path(...),
     user: UserAssignedWorkplace = Depends(admin),
 ):
-    workplace = await Workplace.find_one(Workplace.id == workplace_id)
-    await workplace.update({"$set": workplace_update.model_dump(exclude_none=True)})
+    workplace = await Workplace.by_id(workplace_id)
+    if workplace is None:
+        raise WorkplaceNotFoundError("Worplace не найден")
+    async with WorkplaceSequence.stamp(workplace_id) as seq:
+        await workplace.update({"$set": {**workplace_update.model_dump(exclude_none=True), "seq": seq}})
     return SuccessfulResponse()
 
 
-@router.delete("/workplaces/{workplace_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/workplaces/{workplace_id}", response_model=CascadeJobStatus, status_code=status.HTTP_202_ACCEPTED)
 async def delete_workplace(workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(admin)):
-    workplace = await Workplace.find_one(Workplace.id == workplace_id, fetch_links=True)
-    await workplace.delete()
-    return None
+    result = await Workplace.get_motor_collection().update_one(
+        {"_id": workplace_id, "deleted": {"$ne": True}}, {"$set": {"deleted": True}}
+    )
+    if result.modified_count == 0:
+        raise WorkplaceNotFoundError("Worplace не найден")
+    # доступ отзывается сразу, остальные данные удаляет фоновая задача
+    memberships = (
+        await UserAssignedWorkplace.get_motor_collection()
+        .find({"workplace_id": workplace_id}, {"user": 1})
+        .to_list(length=None)
+    )
+    await UserAssignedWorkplace.get_motor_collection().delete_many({"workplace_id": workplace_id})
+    for membership in memberships:
+        await invalidate_membership(membership["user"].id, workplace_id)
+    await member_directory.drop(workplace_id)
+    job = await cascade_worker.enqueue("workplace", workplace_id, workplace_id, user.user.ref.id)
+    return CascadeJobStatus.model_validate(job.model_dump())
 
 
 @router.get(
     "/workplaces/{workplace_id}/users",
-    response_model=List[UserAssignedWorkplace],
-    response_model_by_alias=False,
+    response_model=List[WorkplaceMember],
     status_code=status.HTTP_200_OK,
 )
 async def get_users(
-    prefix_email: str | None = "", workplace_id: UUID = Path(...), user: UserAssignedWorkplace = Depends(guest)
+    prefix_email: str | None = "",
+    limit: int | None = Query(default=None, ge=1),
+    workplace_id: UUID = Path(...),
+    user: UserAssignedWorkplace = Depends(guest),
 ):
-    users = await UserAssignedWorkplace.find(
-        UserAssignedWorkplace.workplace.id == workplace_id,
-        RegEx(UserAssignedWorkplace.user.email, "^" + prefix_email),
-        fetch_links=True,
-    ).to_list()
-    return users
+    return await member_directory.search(workplace_id, prefix_email or "", limit)
 
 
 @router.get(
-    "/workplaces", response_model=List[Workplace], response_model_by_alias=False, status_code=status.HTTP_200_OK
+    "/workplaces",
+    response_model=List[WorkplaceSummary],
+    response_model_by_alias=False,
+    status_code=status.HTTP_200_OK,
 )
 async def get_user_workplaces(user: User = Depends(get_current_user)):
-    workplaces = await Workplace.find(fetch_links=True).to_list()
-    # TODO убрать эту херню и сделать номарльно. Андрей что-то говорит про подумать.
-    workplaces = [w for w in workplaces for u in w.users if u.user.id == user.id]
-    return workplaces
+    # список идёт от членства пользователя, а не от всех workplace в базе
+    roles = await user_workplace_roles(user.id)
+    if not roles:
+        return []
+    documents = (
+        await Workplace.get_motor_collection()
+        .find({"_id": {"$in": list(roles)}, "deleted": {"$ne": True}}, WorkplaceSummary.projection)
+        .sort("name", ASCENDING)
+        .to_list(length=None)
+    )
+    return [WorkplaceSummary.model_validate({**document, "role": roles[document["_id"]]}) for document in documents]
 
 
 @router.get("/workplaces/{workplace_id}/invitation/{invitation_id}", status_code=status.HTTP_200_OK)
@@ -91,26 +126,34 @@ async def add_to_workplace(
     if not user:
         return RedirectResponse(client_api_settings.LOGIN_URL)
     # Если всё хорошо
-    workplace = await Workplace.find_one(Workplace.id == workplace_id)
-    workplace.users.append(UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN))
-    await workplace.save(link_rule=WriteRules.WRITE)
+    workplace = await Workplace.by_id(workplace_id)
+    if workplace is None:
+        raise WorkplaceNotFoundError("Worplace не найден")
+    membership = UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN)
+    await membership.insert()
+    # дописывается только ссылка, сам workplace не перезаписывается
+    await Workplace.get_motor_collection().update_one(
+        {"_id": workplace.id},
+        {"$push": {"users": DBRef(UserAssignedWorkplace.get_motor_collection().name, membership.id)}},
+    )
+    await invalidate_membership(user.id, workplace.id)
     return RedirectResponse(client_api_settings.WORKPLACE_URL)
 
 
 @router.post("/workplaces/{workplace_id}/invite", response_model=SuccessfulResponse, status_code=status.HTTP_200_OK)
 async def invite_to_workplace(
     request: Request,
-    background_tasks: BackgroundTasks,
     new_user_email: InviteModel,
     email: Email = Depends(Email),
     workplace_id: UUID = Path(...),
     redis: Redis = Depends(Redis),
     user: UserAssignedWorkplace = Depends(admin),
 ):
-    workplace = await Workplace.find_one(Workplace.id == workplace_id)
+    workplace = await Workplace.by_id(workplace_id)
+    if workplace is None:
+        raise WorkplaceNotFoundError("Worplace не найден")
     invitation_id = str(uuid4())
-    background_tasks.add_task(
-        email.send_invitation_mail, request, new_user_email.email, workplace_id, invitation_id, workplace.name
-    )
+    # письмо уходит воркером, поэтому приглашение должно быть сохранено до постановки в очередь
     await redis.set_uuid_invite_email(invitation_id, new_user_email.email)
+    await email.send_invitation_mail(request, new_user_email.email, workplace_id, invitation_id, workplace.name)
     return SuccessfulResponse()
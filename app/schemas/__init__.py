@@ -1,6 +1,32 @@
-from .documents import Comment, Issue, Sprint, User, UserAssignedWorkplace, Workplace
+from .documents import (
+    Blob,
+    CascadeJob,
+    Comment,
+    Issue,
+    Sprint,
+    SprintStats,
+    Tombstone,
+    User,
+    UserAssignedWorkplace,
+    Workplace,
+    WorkplaceFile,
+    WorkplaceSequence,
+)
 
-__beanie_models__ = [User, Workplace, Sprint, UserAssignedWorkplace, Issue, Comment]
+__beanie_models__ = [
+    User,
+    Workplace,
+    Sprint,
+    UserAssignedWorkplace,
+    Issue,
+    Comment,
+    Blob,
+    WorkplaceFile,
+    WorkplaceSequence,
+    Tombstone,
+    SprintStats,
+    CascadeJob,
+]
 
 
 __all__ = [
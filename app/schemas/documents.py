@@ -1,16 +1,32 @@
-from datetime import datetime
-from typing import List
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Literal, Optional, Set
 from uuid import UUID, uuid4
 
-from beanie import BackLink, Delete, Document, Indexed, Link, WriteRules, before_event
+from beanie import BackLink, Delete, Document, Indexed, Link, before_event
 from beanie.odm.operators.find.logical import And, Or
+from beanie.operators import NE
+from bson import DBRef
 from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument
 
+from app.config import live_settings, search_settings
 from app.core.exceptions import ValidationError
 
-from .models import CommentCreation, IssueBase, SprintBase, UserRegister, WorkplaceCreation
+from .models import AuthorSnapshot, CommentCreation, IssueBase, SprintBase, UserRegister, WorkplaceCreation
 from .types import Role
 
+# фоновые освобождения номеров; ссылки держатся, пока задачи не завершатся
+_releases: Set[asyncio.Task] = set()
+
+
+def _forget_release(task: asyncio.Task) -> None:
+    _releases.discard(task)
+    # неосвобождённый номер всё равно отбросится по истечении SYNC_PENDING_TTL
+    if not task.cancelled():
+        task.exception()
+
 
 class User(Document, UserRegister):
     id: UUID = Field(default_factory=uuid4)
@@ -18,6 +34,8 @@ class User(Document, UserRegister):
     password: str = Field(exclude=True)
     name: str = Field()
     avatar_url: str = Field(default_factory=str)
+    # увеличивается при изменении членства, делая роли в выданных токенах устаревшими
+    token_version: int = Field(default=0, exclude=True)
 
     @property
     def created(self) -> datetime:
@@ -43,6 +61,12 @@ class UserAssignedWorkplace(Document):
     workplace: BackLink["Workplace"] = Field(original_field="users", exclude=True)
     workplace_id: UUID = Field(exclude=True)
 
+    class Settings:
+        indexes = [
+            IndexModel([("user.$id", ASCENDING), ("workplace_id", ASCENDING)]),
+            IndexModel([("workplace_id", ASCENDING)]),
+        ]
+
     @before_event(Delete)
     async def delete_refs(self):
         self.user = None
@@ -57,17 +81,115 @@ class UserAssignedWorkplace(Document):
         return self.id == id
 
 
+class WorkplaceSequence(Document):
+    """
+    Monotonic per-workplace change counter used by the delta sync. A number stays pending
+    until the write stamped with it has finished, and the feed never moves past a pending one.
+    """
+
+    id: UUID
+    seq: int = Field(default=0)
+    pending: List[Dict] = Field(default_factory=list)
+
+    @classmethod
+    async def next(cls, workplace_id: UUID, session=None) -> int:
+        now = datetime.now()
+        claim = {"seq": "$seq", "until": now + timedelta(seconds=live_settings.SYNC_PENDING_TTL)}
+        counter = await cls.get_motor_collection().find_one_and_update(
+            {"_id": workplace_id},
+            [
+                {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, 1]}}},
+                # номера упавших запросов отбрасываются по истечении срока
+                {
+                    "$set": {
+                        "pending": {
+                            "$concatArrays": [
+                                {
+                                    "$filter": {
+                                        "input": {"$ifNull": ["$pending", []]},
+                                        "cond": {"$gt": ["$$this.until", now]},
+                                    }
+                                },
+                                [claim],
+                            ]
+                        }
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        return counter["seq"]
+
+    @classmethod
+    async def release(cls, workplace_id: UUID, seq: int) -> None:
+        await cls.get_motor_collection().update_one({"_id": workplace_id}, {"$pull": {"pending": {"seq": seq}}})
+
+    @classmethod
+    @asynccontextmanager
+    async def stamp(cls, workplace_id: UUID) -> AsyncIterator[int]:
+        """Allocate a number for a write made inside the block"""
+        seq = await cls.next(workplace_id)
+        try:
+            yield seq
+        finally:
+            # ответ не ждёт освобождения номера: до него синхронизация лишь придерживает водяной знак
+            task = asyncio.create_task(cls.release(workplace_id, seq))
+            _releases.add(task)
+            task.add_done_callback(_forget_release)
+
+    @classmethod
+    async def watermark(cls, workplace_id: UUID) -> int:
+        """The largest number up to which every stamped write has finished"""
+        counter = await cls.get_motor_collection().find_one({"_id": workplace_id})
+        if counter is None:
+            return 0
+        now = datetime.now()
+        pending = [claim["seq"] for claim in counter.get("pending", []) if claim["until"] > now]
+        return min(pending) - 1 if pending else counter["seq"]
+
+
+class Tombstone(Document):
+    """Records deleted documents so that sync clients can drop them."""
+
+    id: UUID = Field(default_factory=uuid4)
+    workplace_id: UUID
+    seq: int
+    kind: Literal["sprint", "issue", "comment"]
+    ids: List[UUID] = Field(default_factory=list)
+    deletion_date: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        indexes = [
+            IndexModel([("workplace_id", ASCENDING), ("seq", ASCENDING)]),
+        ]
+
+    @classmethod
+    async def record(cls, workplace_id: UUID, kind: str, ids: List[UUID]) -> None:
+        if ids:
+            async with WorkplaceSequence.stamp(workplace_id) as seq:
+                await cls.write(workplace_id, seq, kind, ids)
+
+    @classmethod
+    async def write(cls, workplace_id: UUID, seq: int, kind: str, ids: List[UUID], session=None) -> None:
+        """Insert a tombstone stamped by the caller, e.g. inside its transaction"""
+        if ids:
+            await cls(workplace_id=workplace_id, seq=seq, kind=kind, ids=ids).insert(session=session)
+
+
 class Workplace(Document, WorkplaceCreation):
     id: UUID = Field(default_factory=uuid4)
     users: List[Link["UserAssignedWorkplace"]] = Field(default_factory=list, exclude=True)
     sprints: List[Link["Sprint"]] = Field(default_factory=list)
+    seq: int = Field(default=0, exclude=True)
+    # удалённый workplace скрыт сразу, а его данные удаляет CascadeJob
+    deleted: bool = Field(default=False, exclude=True)
 
-    @before_event(Delete)
-    async def delete_refs(self):
-        await UserAssignedWorkplace.find(UserAssignedWorkplace.workplace_id == self.id).delete()
-        await Comment.find(Comment.workplace_id == self.id).delete()
-        await Issue.find(Issue.workplace_id == self.id).delete()
-        await Sprint.find(Sprint.workplace_id == self.id).delete()
+    @classmethod
+    async def by_id(cls, workplace_id: UUID, **kwargs) -> Optional["Workplace"]:
+        """Get a workplace that is not being deleted"""
+        return await cls.find_one(cls.id == workplace_id, NE(cls.deleted, True), **kwargs)
 
 
 class Sprint(Document, SprintBase):
@@ -75,13 +197,25 @@ class Sprint(Document, SprintBase):
     issues: List[Link["Issue"]] = Field(default_factory=list, exclude=True)
     workplace: BackLink["Workplace"] = Field(original_field="sprints", exclude=True)
     workplace_id: UUID = Field(exclude=True)
+    seq: int = Field(default=0, exclude=True)
+    deleted: bool = Field(default=False, exclude=True)
 
-    @before_event(Delete)
-    async def delete_refs(self):
-        self.workplace.sprints.remove(self.id)
-        await self.workplace.save(link_rule=WriteRules.WRITE)
-        await Comment.find(Comment.sprint_id == self.id).delete()
-        await Issue.find(Issue.sprint_id == self.id).delete()
+    class Settings:
+        indexes = [
+            IndexModel([("workplace_id", ASCENDING), ("seq", ASCENDING)]),
+        ]
+
+    @classmethod
+    async def by_id(cls, workplace_id: UUID, sprint_id: UUID, **kwargs) -> Optional["Sprint"]:
+        """Get a sprint of the workplace that is not being deleted"""
+        return await cls.find_one(
+            cls.workplace_id == workplace_id, cls.id == sprint_id, NE(cls.deleted, True), **kwargs
+        )
+
+    @classmethod
+    async def deleted_ids(cls, workplace_id: UUID) -> List[UUID]:
+        """Sprints of the workplace that are hidden but not yet removed by their cascade job"""
+        return await cls.get_motor_collection().distinct("_id", {"workplace_id": workplace_id, "deleted": True})
 
     def check_date_order(start_date: datetime, end_date: datetime):
         if start_date.timestamp() > end_date.timestamp():
@@ -97,6 +231,7 @@ class Sprint(Document, SprintBase):
                 And(Sprint.start_date <= start_date, Sprint.end_date >= end_date),
             ),
             Sprint.id != sprint_id,
+            NE(Sprint.deleted, True),
             fetch_links=True,
         )
         if find_sprint is not None:
@@ -118,12 +253,53 @@ class Issue(Document, IssueBase):
     sprint: BackLink["Sprint"] = Field(default=None, original_field="issues", exclude=True)
     workplace_id: UUID = Field(exclude=True)
     sprint_id: UUID = Field(exclude=True)
+    # увеличивается при каждом изменении, клиент передаёт её для проверки конфликтов
+    revision: int = Field(default=0)
+    seq: int = Field(default=0, exclude=True)
 
-    @before_event(Delete)
-    async def delete_refs(self):
-        self.sprint.issues.remove(self.id)
-        await self.sprint.save(link_rule=WriteRules.WRITE)
-        await Comment.find(Comment.issue_id == self.id).delete()
+    class Settings:
+        indexes = [
+            IndexModel(
+                [("workplace_id", ASCENDING), ("name", TEXT), ("text", TEXT)],
+                weights={"name": 10, "text": 1},
+                default_language=search_settings.SEARCH_LANGUAGE,
+                name="issue_text",
+            ),
+            IndexModel(
+                [
+                    ("workplace_id", ASCENDING),
+                    ("implementers.$id", ASCENDING),
+                    ("end_date", ASCENDING),
+                    ("_id", ASCENDING),
+                ],
+                name="issue_implementers",
+            ),
+            IndexModel(
+                [("workplace_id", ASCENDING), ("creation_date", DESCENDING), ("_id", DESCENDING)],
+                name="issue_workplace_created",
+            ),
+            IndexModel(
+                [("sprint_id", ASCENDING), ("creation_date", DESCENDING), ("_id", DESCENDING)],
+                name="issue_sprint_created",
+            ),
+            IndexModel([("workplace_id", ASCENDING), ("seq", ASCENDING)], name="issue_seq"),
+        ]
+
+    async def delete_with_refs(self, seq: int, session=None) -> None:
+        """
+        Delete the issue with its comments and its sprint link, leaving tombstones stamped with seq.
+        Every write goes through the session, so the whole cascade commits or aborts together.
+        """
+        await Sprint.get_motor_collection().update_one(
+            {"_id": self.sprint_id},
+            {"$pull": {"issues": DBRef(self.get_motor_collection().name, self.id)}},
+            session=session,
+        )
+        comment_ids = await Comment.get_motor_collection().distinct("_id", {"issue_id": self.id}, session=session)
+        await Comment.get_motor_collection().delete_many({"issue_id": self.id}, session=session)
+        await Tombstone.write(self.workplace_id, seq, "comment", comment_ids, session)
+        await Tombstone.write(self.workplace_id, seq, "issue", [self.id], session)
+        await self.get_motor_collection().delete_one({"_id": self.id}, session=session)
 
     def __eq__(self, other):
         if not isinstance(other, (Issue, UUID)):
@@ -145,14 +321,114 @@ class Comment(Document, CommentCreation):
     workplace_id: UUID = Field(exclude=True)
     sprint_id: UUID = Field(exclude=True)
     issue_id: UUID = Field(exclude=True)
+    seq: int = Field(default=0, exclude=True)
+    # обновляется фоновой задачей при изменении профиля автора
+    author_snapshot: Optional[AuthorSnapshot] = Field(default=None, exclude=True)
+
+    class Settings:
+        indexes = [
+            IndexModel(
+                [("workplace_id", ASCENDING), ("text", TEXT)],
+                default_language=search_settings.SEARCH_LANGUAGE,
+                name="comment_text",
+            ),
+            IndexModel([("workplace_id", ASCENDING), ("seq", ASCENDING)], name="comment_seq"),
+            IndexModel(
+                [("issue_id", ASCENDING), ("creation_date", ASCENDING), ("_id", ASCENDING)], name="comment_thread"
+            ),
+            IndexModel([("author.$id", ASCENDING)], name="comment_author"),
+            # по нему каскад удаляет комментарии спринта пачками
+            IndexModel([("sprint_id", ASCENDING)], name="comment_sprint"),
+        ]
 
     @before_event(Delete)
     async def delete_refs(self):
-        self.issue.comments.remove(self.id)
-        await self.issue.save(link_rule=WriteRules.WRITE)
+        await Comment.unlink(self.issue_id, self.id)
+        await Tombstone.record(self.workplace_id, "comment", [self.id])
+
+    @classmethod
+    async def unlink(cls, issue_id: UUID, comment_id: UUID) -> None:
+        """Remove the comment link from its issue without loading the issue"""
+        await Issue.get_motor_collection().update_one(
+            {"_id": issue_id}, {"$pull": {"comments": DBRef(cls.get_motor_collection().name, comment_id)}}
+        )
 
     def __eq__(self, other):
         if not isinstance(other, (Comment, UUID)):
             return False
         id = other if isinstance(other, UUID) else other.id
         return self.id == id
+
+
+class Blob(Document):
+    # sha256 содержимого
+    id: str
+    size: int
+    refs: int = 0
+    creation_date: datetime = Field(default_factory=datetime.now)
+
+
+class WorkplaceFile(Document):
+    id: UUID = Field(default_factory=uuid4)
+    workplace_id: UUID
+    name: str
+    blob_id: str
+    size: int
+    content_type: Optional[str] = Field(default=None)
+    creation_date: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        indexes = [
+            IndexModel([("workplace_id", ASCENDING), ("name", ASCENDING)], unique=True),
+        ]
+
+
+class SprintStats(Document):
+    """
+    Per-day changes of the sprint issue counters. The seed document holds the counters
+    that existed before the statistics were collected for the sprint.
+    """
+
+    id: UUID = Field(default_factory=uuid4)
+    sprint_id: UUID
+    workplace_id: UUID
+    day: datetime
+    seed: bool = Field(default=False)
+    total: int = Field(default=0)
+    state: Dict[str, int] = Field(default_factory=dict)
+    priority: Dict[str, int] = Field(default_factory=dict)
+    label: Dict[str, int] = Field(default_factory=dict)
+
+    class Settings:
+        indexes = [
+            IndexModel([("sprint_id", ASCENDING), ("day", ASCENDING), ("seed", ASCENDING)], unique=True),
+            IndexModel([("workplace_id", ASCENDING)]),
+        ]
+
+
+class CascadeJob(Document):
+    """
+    Background deletion of everything under a soft-deleted workplace or sprint. The job
+    deletes children in batches and stores its step and counters, so that another worker
+    can take it over after the lease of a crashed one expires.
+    """
+
+    id: UUID = Field(default_factory=uuid4)
+    kind: Literal["workplace", "sprint"]
+    target_id: UUID
+    workplace_id: UUID
+    requested_by: UUID
+    status: Literal["pending", "running", "done", "failed"] = Field(default="pending")
+    step: int = Field(default=0)
+    deleted: Dict[str, int] = Field(default_factory=dict)
+    attempts: int = Field(default=0)
+    owner: Optional[str] = Field(default=None)
+    lease_until: Optional[datetime] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    creation_date: datetime = Field(default_factory=datetime.now)
+    finish_date: Optional[datetime] = Field(default=None)
+
+    class Settings:
+        indexes = [
+            IndexModel([("status", ASCENDING), ("creation_date", ASCENDING)]),
+        ]
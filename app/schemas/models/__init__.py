@@ -1,8 +1,27 @@
-from .auth import CreationResponse, SuccessfulResponse, Token, TokenData, TokenType, UserLogin, UserRegister
-from .comment import CommentCreation, CommentUpdate
-from .issue import IssueBase, IssueCreation, IssueUpdate
+from .auth import (
+    CacheStats,
+    CreationResponse,
+    SuccessfulResponse,
+    Token,
+    TokenData,
+    TokenType,
+    UserLogin,
+    UserRegister,
+    UserUpdate,
+)
+from .comment import AuthorSnapshot, CommentCreation, CommentUpdate
+from .issue import IssueBase, IssueBulkItem, IssueBulkResult, IssueBulkUpdate, IssueCreation, IssueFilter, IssueUpdate
+from .mail import OutboxMail
 from .sprint import SprintBase, SprintCreation, SprintUpdate
-from .workplace import FileModelOut, InviteModel, WorkplaceCreation, WorkplaceUpdate
+from .workplace import (
+    FileModelOut,
+    InviteModel,
+    StoredFile,
+    UploadCreation,
+    UploadSessionOut,
+    WorkplaceCreation,
+    WorkplaceUpdate,
+)
 
 __all__ = [
     "UserRegister",
@@ -17,11 +36,22 @@ __all__ = [
     "SuccessfulResponse",
     "CommentCreation",
     "CommentUpdate",
+    "AuthorSnapshot",
     "FileModelOut",
     "InviteModel",
     "IssueUpdate",
+    "IssueFilter",
+    "IssueBulkUpdate",
+    "IssueBulkItem",
+    "IssueBulkResult",
     "SprintBase",
     "SprintUpdate",
     "WorkplaceUpdate",
     "CreationResponse",
+    "CacheStats",
+    "StoredFile",
+    "UploadCreation",
+    "UploadSessionOut",
+    "UserUpdate",
+    "OutboxMail",
 ]
@@ -1,10 +1,12 @@
 from datetime import datetime
 from enum import StrEnum
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
 
+from ..types import Role
+
 
 class Token(BaseModel):
     access_token: str
@@ -18,6 +20,10 @@ class TokenType(StrEnum):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    id: Optional[UUID] = None
+    # workplace_id -> (id участника воркплейса, роль)
+    roles: Optional[Dict[UUID, Tuple[UUID, Role]]] = None
+    ver: int = 0
     exp: Optional[datetime] = None
 
 
@@ -27,6 +33,10 @@ class UserRegister(BaseModel):
     password: str
 
 
+class UserUpdate(BaseModel):
+    name: str = Field(max_length=20)
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -38,3 +48,11 @@ class SuccessfulResponse(BaseModel):
 
 class CreationResponse(SuccessfulResponse):
     id: UUID
+
+
+class CacheStats(BaseModel):
+    size: int
+    local_hits: int
+    redis_hits: int
+    misses: int
+    invalidations: int
@@ -1,7 +1,10 @@
 from typing import List, Optional
+from uuid import UUID
 
 from pydantic import BaseModel, Field
 
+from ..types import Role
+
 
 class CommentCreation(BaseModel):
     text: str
@@ -11,3 +14,13 @@ class CommentCreation(BaseModel):
 class CommentUpdate(BaseModel):
     text: Optional[str] = Field(default=None)
     files: Optional[List[str]] = Field(default=None)
+
+
+class AuthorSnapshot(BaseModel):
+    """Author data copied into the comment, so that a thread is read without resolving links."""
+
+    id: UUID
+    user_id: Optional[UUID] = Field(default=None)
+    name: Optional[str] = Field(default=None)
+    avatar_url: str = Field(default_factory=str)
+    role: Optional[Role] = Field(default=None)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -32,3 +32,37 @@ class IssueUpdate(BaseModel):
     end_date: Optional[datetime] = Field(default=None)
     implementers: Optional[List[UUID]] = Field(default=None)
     files: Optional[List[str]] = Field(default=None)
+    revision: Optional[int] = Field(default=None)
+
+
+class IssueFilter(BaseModel):
+    state: Optional[State] = Field(default=None)
+    priority: Optional[Priority] = Field(default=None)
+    label: Optional[Label] = Field(default=None)
+    implementer: Optional[UUID] = Field(default=None)
+
+    def query(self) -> dict:
+        query = self.model_dump(exclude={"implementer"}, exclude_none=True)
+        if self.implementer is not None:
+            query["implementers.$id"] = self.implementer
+        return query
+
+
+class IssueBulkUpdate(BaseModel):
+    ids: List[UUID] = Field(min_length=1, max_length=500)
+    priority: Optional[Priority] = Field(default=None)
+    state: Optional[State] = Field(default=None)
+    label: Optional[Label] = Field(default=None)
+    sprint_id: Optional[UUID] = Field(default=None)
+    implementers: Optional[List[UUID]] = Field(default=None)
+
+
+class IssueBulkItem(BaseModel):
+    id: UUID
+    status: Literal["updated", "not_found", "failed"]
+    error: Optional[str] = Field(default=None)
+
+
+class IssueBulkResult(BaseModel):
+    updated: int
+    results: List[IssueBulkItem]
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel, Field
+
+
+class OutboxMail(BaseModel):
+    """A letter waiting in the Redis outbox for the mail worker."""
+
+    id: UUID = Field(default_factory=uuid4)
+    recipients: List[str]
+    subject: str
+    body: str
+    subtype: str = Field(default="html")
+    attempts: int = Field(default=0)
+    error: Optional[str] = Field(default=None)
+    creation_date: datetime = Field(default_factory=datetime.now)
@@ -1,25 +1,212 @@
-from typing import List
+from datetime import datetime
+from typing import ClassVar, Dict, List, Literal, Optional
+from uuid import UUID
 
-from pydantic import BaseModel, Field
+from bson import DBRef
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
-from app.schemas.documents import Issue, Sprint
-from app.schemas.types import State
+from app.schemas.documents import Sprint
+from app.schemas.models.comment import AuthorSnapshot
+from app.schemas.types import Label, Priority, Role, State
+
+
+class IssueSummary(BaseModel):
+    """Lightweight issue card read straight from MongoDB: links are returned as ids."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    name: str
+    priority: Priority
+    state: State
+    label: Label
+    end_date: Optional[datetime] = Field(default=None)
+    creation_date: datetime
+    sprint_id: UUID
+    author: Optional[UUID] = Field(default=None)
+    implementers: List[UUID] = Field(default_factory=list)
+    revision: int = Field(default=0)
+
+    projection: ClassVar[dict] = {
+        "name": 1,
+        "priority": 1,
+        "state": 1,
+        "label": 1,
+        "end_date": 1,
+        "creation_date": 1,
+        "sprint_id": 1,
+        "author": 1,
+        "implementers": 1,
+        "revision": 1,
+    }
+
+    @field_validator("author", "implementers", mode="before")
+    @classmethod
+    def refs_to_ids(cls, value):
+        if isinstance(value, list):
+            return [item.id if isinstance(item, DBRef) else item for item in value]
+        return value.id if isinstance(value, DBRef) else value
+
+
+class IssueSearchHit(IssueSummary):
+    score: float
+
+
+class IssueSearchPage(BaseModel):
+    items: List[IssueSearchHit] = Field(default_factory=list)
+    page: int
+    limit: int
+    has_more: bool
+
+
+class IssuePage(BaseModel):
+    items: List[IssueSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(default=None)
 
 
 class Column(BaseModel):
     name: State
-    issues: List[Issue] = Field(default_factory=list)
-
-    @staticmethod
-    def group(issues: List[Issue]) -> List["Column"]:
-        columns = [Column(name=state) for state in State]
-        for issue in issues:
-            for column in columns:
-                if issue.state == column.name:
-                    column.issues.append(issue)
-        return columns
+    count: int = Field(default=0)
+    issues: List[IssueSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(default=None)
 
 
 class SprintResponse(Sprint):
     workplace_id: None = Field(default=None, exclude=True)
     columns: List[Column] = Field(default_factory=list)
+
+
+class MemberUser(BaseModel):
+    id: UUID
+    email: str
+    name: str
+    avatar_url: str = Field(default_factory=str)
+
+
+class WorkplaceMember(BaseModel):
+    id: UUID
+    role: Role
+    user: MemberUser
+
+
+class WorkplaceSummary(BaseModel):
+    """A workplace in the user's list: no members or sprints, plus the user's role in it."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    name: str
+    description: Optional[str] = Field(default=None)
+    role: Role
+
+    projection: ClassVar[dict] = {"name": 1, "description": 1}
+
+
+class IssueChange(IssueSummary):
+    text: str
+    files: List[str] = Field(default_factory=list)
+
+    projection: ClassVar[dict] = {**IssueSummary.projection, "text": 1, "files": 1}
+
+
+class SprintChange(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    name: str
+    start_date: datetime
+    end_date: datetime
+
+
+class WorkplaceChange(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    name: str
+    description: Optional[str] = Field(default=None)
+
+
+class CommentChange(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    text: str
+    files: List[str] = Field(default_factory=list)
+    creation_date: datetime
+    author: Optional[UUID] = Field(default=None)
+    issue_id: UUID
+
+    @field_validator("author", mode="before")
+    @classmethod
+    def ref_to_id(cls, value):
+        return value.id if isinstance(value, DBRef) else value
+
+
+class CommentSummary(BaseModel):
+    """Comment in a thread page; the author is the snapshot stored with the comment."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: UUID = Field(alias="_id")
+    text: str
+    files: List[str] = Field(default_factory=list)
+    creation_date: datetime
+    issue_id: UUID
+    author: Optional[AuthorSnapshot] = Field(default=None, alias="author_snapshot")
+
+    projection: ClassVar[dict] = {"text": 1, "files": 1, "creation_date": 1, "issue_id": 1, "author_snapshot": 1}
+
+
+class CommentPage(BaseModel):
+    items: List[CommentSummary]
+    next_cursor: Optional[str] = Field(default=None)
+
+
+class TombstoneChange(BaseModel):
+    seq: int
+    kind: str
+    ids: List[UUID]
+
+
+class Changes(BaseModel):
+    seq: int
+    workplace: Optional[WorkplaceChange] = Field(default=None)
+    sprints: List[SprintChange] = Field(default_factory=list)
+    issues: List[IssueChange] = Field(default_factory=list)
+    comments: List[CommentChange] = Field(default_factory=list)
+    tombstones: List[TombstoneChange] = Field(default_factory=list)
+
+
+class LiveEvent(BaseModel):
+    type: str
+    ids: List[UUID] = Field(default_factory=list)
+    sprint_ids: List[UUID] = Field(default_factory=list)
+    issue_id: Optional[UUID] = Field(default=None)
+    seq: Optional[int] = Field(default=None)
+
+
+class CascadeJobStatus(BaseModel):
+    id: UUID
+    kind: Literal["workplace", "sprint"]
+    target_id: UUID
+    status: Literal["pending", "running", "done", "failed"]
+    deleted: Dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = Field(default=None)
+    creation_date: datetime
+    finish_date: Optional[datetime] = Field(default=None)
+
+
+class BurndownPoint(BaseModel):
+    day: datetime
+    total: int
+    remaining: int
+    state: Dict[str, int] = Field(default_factory=dict)
+    priority: Dict[str, int] = Field(default_factory=dict)
+    label: Dict[str, int] = Field(default_factory=dict)
+
+
+class Burndown(BaseModel):
+    sprint_id: UUID
+    start_date: datetime
+    end_date: datetime
+    points: List[BurndownPoint] = Field(default_factory=list)
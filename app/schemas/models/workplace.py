@@ -1,4 +1,5 @@
 from typing import Optional
+from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -15,7 +16,27 @@ class WorkplaceUpdate(BaseModel):
 
 class FileModelOut(BaseModel):
     url: str
+    size: int
+    hash: str
+
+
+class StoredFile(BaseModel):
+    filename: str
+    size: int
+    hash: str
 
 
 class InviteModel(BaseModel):
     email: EmailStr
+
+
+class UploadCreation(BaseModel):
+    filename: str
+    size: int = Field(ge=0)
+    content_type: Optional[str] = Field(default=None)
+
+
+class UploadSessionOut(BaseModel):
+    id: UUID
+    offset: int
+    size: int
@@ -0,0 +1,90 @@
+"""
+Avatar rendering microbenchmark for sizes from 60 to 512 px:
+
+    python -m benchmarks.avatar_render --sizes 60 120 240 384 504 --samples 200
+
+Needs no database: the identicon is rendered in memory. For every size it compares the
+former per-pixel renderer (draw.point over size x size pixels) with the block-matrix one,
+both including the PNG encoding, and measures a hit of the in-memory PNG cache.
+Sizes must be multiples of 12.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from hashlib import md5
+from io import BytesIO
+from typing import Callable, List
+from uuid import uuid4
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.core.avatar import Avatar
+
+
+def render_per_pixel(avatar: Avatar, user_id_str: str, size: int) -> bytes:
+    """The renderer the block matrix replaced, kept here as the baseline."""
+    digest = md5(user_id_str.encode("utf-8")).digest()
+    need_color = np.array([bit == "1" for byte in digest[3 : 3 + 9] for bit in bin(byte)[2:].zfill(8)]).reshape(6, 12)
+    need_color = np.concatenate((need_color, need_color[::-1]), axis=0)
+    for i in range(12):
+        need_color[0, i] = 0
+        need_color[11, i] = 0
+        need_color[i, 0] = 0
+        need_color[i, 11] = 0
+    main_color = tuple(channel // 2 + 128 for channel in digest[:3])
+    block_size = size // 12
+    image = Image.new("RGB", (size, size), avatar.background_color)
+    draw = ImageDraw.Draw(image)
+    for x in range(size):
+        for y in range(size):
+            if need_color[x // block_size, y // block_size]:
+                draw.point((x, y), main_color)
+    buffer = BytesIO()
+    image.save(buffer, "png")
+    return buffer.getvalue()
+
+
+def measure(render: Callable[[str], object], samples: int) -> List[float]:
+    latencies = []
+    for _ in range(samples):
+        user_id_str = str(uuid4())
+        started = time.perf_counter()
+        render(user_id_str)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def measure_cached(avatar: Avatar, size: int, samples: int) -> List[float]:
+    user_id_str = str(uuid4())
+    avatar.cache.set((user_id_str, size), avatar.render(user_id_str, size))
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await avatar(user_id_str, size)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main(sizes: List[int], samples: int, baseline_samples: int) -> None:
+    avatar = Avatar()
+    print(f"{'size':>6} {'per-pixel, ms':>14} {'blocks, ms':>11} {'speedup':>8} {'cached, ms':>11}")
+    for size in sorted(sizes):
+        # после выбора корзины размер должен совпадать с запрошенным, иначе кэш хранит другой
+        avatar.sizes = [size]
+        baseline = statistics.median(
+            measure(lambda user_id_str: render_per_pixel(avatar, user_id_str, size), baseline_samples)
+        )
+        blocks = statistics.median(measure(lambda user_id_str: avatar.render(user_id_str, size), samples))
+        cached = statistics.median(await measure_cached(avatar, size, samples))
+        print(f"{size:>6} {baseline:>14.2f} {blocks:>11.2f} {baseline / blocks:>7.1f}x {cached:>11.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 120, 240, 384, 504])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--baseline-samples", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.samples, args.baseline_samples))
@@ -0,0 +1,109 @@
+"""
+Comment creation latency on an issue that already has many comments:
+
+    python -m benchmarks.comment_latency --comments 0 1000 5000 --samples 200
+
+Uses MONGO_URL and REDIS_URL from .env. The data is written to a separate database
+that is dropped afterwards. With links appended by $push the latency should stay flat
+as the thread grows.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from beanie import init_beanie
+from bson import DBRef
+
+from app.core.mongo_session import MongoManager
+from app.core.redis_session import Redis
+from app.routers.comment import create_comment
+from app.schemas import __beanie_models__
+from app.schemas.documents import Comment, Issue, Role, Sprint, User, UserAssignedWorkplace, Workplace
+from app.schemas.models import CommentCreation
+
+DATABASE = "benchmark_comments"
+
+
+async def grow_thread(issue: Issue, membership: UserAssignedWorkplace, count: int) -> None:
+    """Adds comments to the issue directly, without going through the endpoint."""
+    batch = 1000
+    for start in range(0, count, batch):
+        comments = [
+            Comment(
+                text=f"comment {start + i}",
+                author=membership,
+                issue_id=issue.id,
+                sprint_id=issue.sprint_id,
+                workplace_id=issue.workplace_id,
+            )
+            for i in range(min(batch, count - start))
+        ]
+        await Comment.insert_many(comments)
+        collection = Comment.get_motor_collection().name
+        await Issue.get_motor_collection().update_one(
+            {"_id": issue.id},
+            {"$push": {"comments": {"$each": [DBRef(collection, comment.id) for comment in comments]}}},
+        )
+
+
+async def measure(issue: Issue, membership: UserAssignedWorkplace, samples: int) -> List[float]:
+    latencies = []
+    for i in range(samples):
+        started = time.perf_counter()
+        await create_comment(CommentCreation(text=f"sample {i}"), issue.workplace_id, issue.id, membership)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main(checkpoints: List[int], samples: int) -> None:
+    client = MongoManager().get_async_client()
+    await client.drop_database(DATABASE)
+    await init_beanie(database=client[DATABASE], document_models=__beanie_models__)
+    await Redis.connect_redis()
+    try:
+        user = User(email="benchmark@example.com", password="-", name="Benchmark")
+        await user.insert()
+        workplace = Workplace(name="benchmark")
+        membership = UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN)
+        await membership.insert()
+        workplace.users = [membership]
+        await workplace.insert()
+        # в обработчик членство приходит из базы, со ссылкой на пользователя
+        membership = await UserAssignedWorkplace.get(membership.id)
+        now = datetime.now()
+        sprint = Sprint(name="benchmark", start_date=now, end_date=now + timedelta(days=14), workplace_id=workplace.id)
+        await sprint.insert()
+        issue = Issue(
+            name="benchmark",
+            text="",
+            priority="LOW",
+            state="Backlog",
+            label="backend",
+            sprint_id=sprint.id,
+            workplace_id=workplace.id,
+            author=membership,
+        )
+        await issue.insert()
+
+        existing = 0
+        print(f"{'comments':>10} {'p50, ms':>10} {'p95, ms':>10} {'max, ms':>10}")
+        for checkpoint in sorted(checkpoints):
+            await grow_thread(issue, membership, max(checkpoint - existing, 0))
+            latencies = await measure(issue, membership, samples)
+            existing = max(checkpoint, existing) + samples
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{checkpoint:>10} {statistics.median(latencies):>10.2f} {p95:>10.2f} {max(latencies):>10.2f}")
+    finally:
+        await client.drop_database(DATABASE)
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, nargs="+", default=[0, 1000, 5000, 20000])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.comments, args.samples))
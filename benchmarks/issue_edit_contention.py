@@ -0,0 +1,107 @@
+"""
+Issue edit latency under concurrent editors of the same issue:
+
+    python -m benchmarks.issue_edit_contention --editors 1 8 32 --samples 100
+
+Uses MONGO_URL and REDIS_URL from .env. The data is written to a separate database
+that is dropped afterwards. Every editor sends its edits one after another with the
+revision it has last seen, so a conflict is counted when another editor got there first.
+Text edits are a single write, state edits also update the sprint statistics in a transaction.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from beanie import init_beanie
+
+from app.core.exceptions import ConflictException
+from app.core.mongo_session import MongoManager
+from app.core.redis_session import Redis
+from app.routers.issue import edit_issue
+from app.schemas import __beanie_models__
+from app.schemas.documents import Issue, Role, Sprint, User, UserAssignedWorkplace, Workplace
+from app.schemas.models import IssueUpdate
+from app.schemas.types import State
+
+DATABASE = "benchmark_issue_edits"
+STATES = [State.BACKLOG, State.INPROGRESS, State.DONE]
+
+
+async def editor(issue: Issue, membership: UserAssignedWorkplace, kind: str, samples: int) -> Tuple[List[float], int]:
+    latencies = []
+    conflicts = 0
+    for i in range(samples):
+        current = await Issue.get_motor_collection().find_one({"_id": issue.id}, {"revision": 1})
+        if kind == "text":
+            update = IssueUpdate(text=f"edit {i}", revision=current.get("revision", 0))
+        else:
+            update = IssueUpdate(state=STATES[i % len(STATES)], revision=current.get("revision", 0))
+        started = time.perf_counter()
+        try:
+            await edit_issue(update, issue.workplace_id, issue.id, membership)
+        except ConflictException:
+            conflicts += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, conflicts
+
+
+async def measure(
+    issue: Issue, membership: UserAssignedWorkplace, kind: str, editors: int, samples: int
+) -> Tuple[List[float], int]:
+    results = await asyncio.gather(*(editor(issue, membership, kind, samples) for _ in range(editors)))
+    return [latency for latencies, _ in results for latency in latencies], sum(conflicts for _, conflicts in results)
+
+
+async def main(editors: List[int], samples: int) -> None:
+    client = MongoManager().get_async_client()
+    await client.drop_database(DATABASE)
+    await init_beanie(database=client[DATABASE], document_models=__beanie_models__)
+    await Redis.connect_redis()
+    try:
+        user = User(email="benchmark@example.com", password="-", name="Benchmark")
+        await user.insert()
+        workplace = Workplace(name="benchmark")
+        membership = UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN)
+        await membership.insert()
+        workplace.users = [membership]
+        await workplace.insert()
+        # в обработчик членство приходит из базы, со ссылкой на пользователя
+        membership = await UserAssignedWorkplace.get(membership.id)
+        now = datetime.now()
+        sprint = Sprint(name="benchmark", start_date=now, end_date=now + timedelta(days=14), workplace_id=workplace.id)
+        await sprint.insert()
+        issue = Issue(
+            name="benchmark",
+            text="",
+            priority="LOW",
+            state="Backlog",
+            label="backend",
+            sprint_id=sprint.id,
+            workplace_id=workplace.id,
+            author=membership,
+        )
+        await issue.insert()
+
+        print(f"{'editors':>8} {'kind':>6} {'p50, ms':>10} {'p95, ms':>10} {'max, ms':>10} {'conflicts':>10}")
+        for count in sorted(editors):
+            for kind in ("text", "state"):
+                latencies, conflicts = await measure(issue, membership, kind, count, samples)
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(
+                    f"{count:>8} {kind:>6} {statistics.median(latencies):>10.2f} {p95:>10.2f}"
+                    f" {max(latencies):>10.2f} {conflicts / len(latencies):>10.1%}"
+                )
+    finally:
+        await client.drop_database(DATABASE)
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--editors", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.editors, args.samples))
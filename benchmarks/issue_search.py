@@ -0,0 +1,131 @@
+"""
+Full-text issue search on a workplace with 100k issues:
+
+    python -m benchmarks.issue_search --issues 100000 --comments 20000 --samples 50
+
+Uses MONGO_URL and REDIS_URL from .env. The data is written to a separate database
+that is dropped afterwards. Issue names and texts are drawn from a fixed vocabulary, so
+a common word matches a large share of the workplace and a rare one only a few issues.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+from uuid import UUID
+
+from beanie import init_beanie
+
+from app.config import search_settings
+from app.core.mongo_session import MongoManager
+from app.core.redis_session import Redis
+from app.core.search import issue_search
+from app.schemas import __beanie_models__
+from app.schemas.documents import Comment, Issue, Role, Sprint, User, UserAssignedWorkplace, Workplace
+
+DATABASE = "benchmark_search"
+# частота слова убывает с его номером
+VOCABULARY = [f"слово{i}" for i in range(2000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def sentence(words: int) -> str:
+    return " ".join(random.choices(VOCABULARY, weights=WEIGHTS, k=words))
+
+
+async def fill(sprint: Sprint, membership: UserAssignedWorkplace, issues: int, comments: int) -> None:
+    batch = 1000
+    created = datetime.now() - timedelta(days=365)
+    issue_ids = []
+    for start in range(0, issues, batch):
+        documents = [
+            Issue(
+                name=sentence(4),
+                text=sentence(30),
+                priority="LOW",
+                state="Backlog",
+                label="backend",
+                sprint_id=sprint.id,
+                workplace_id=sprint.workplace_id,
+                author=membership,
+                creation_date=created + timedelta(minutes=start + i),
+            )
+            for i in range(min(batch, issues - start))
+        ]
+        await Issue.insert_many(documents)
+        issue_ids.extend(document.id for document in documents)
+    for start in range(0, comments, batch):
+        documents = [
+            Comment(
+                text=sentence(15),
+                author=membership,
+                issue_id=random.choice(issue_ids),
+                sprint_id=sprint.id,
+                workplace_id=sprint.workplace_id,
+            )
+            for _ in range(min(batch, comments - start))
+        ]
+        await Comment.insert_many(documents)
+
+
+async def measure(workplace_id: UUID, query: str, page: int, limit: int, samples: int) -> List[float]:
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await issue_search.search(workplace_id, query, page, limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main(issues: int, comments: int, samples: int, limit: int) -> None:
+    client = MongoManager().get_async_client()
+    await client.drop_database(DATABASE)
+    await init_beanie(database=client[DATABASE], document_models=__beanie_models__)
+    await Redis.connect_redis()
+    try:
+        random.seed(0)
+        user = User(email="benchmark@example.com", password="-", name="Benchmark")
+        await user.insert()
+        workplace = Workplace(name="benchmark")
+        membership = UserAssignedWorkplace(user=user, workplace_id=workplace.id, role=Role.ADMIN)
+        await membership.insert()
+        workplace.users = [membership]
+        await workplace.insert()
+        membership = await UserAssignedWorkplace.get(membership.id)
+        now = datetime.now()
+        sprint = Sprint(name="benchmark", start_date=now, end_date=now + timedelta(days=14), workplace_id=workplace.id)
+        await sprint.insert()
+
+        started = time.perf_counter()
+        await fill(sprint, membership, issues, comments)
+        print(f"{issues} issues and {comments} comments inserted in {time.perf_counter() - started:.1f} s")
+
+        last_page = search_settings.SEARCH_WINDOW // limit - 1
+        cases = [
+            ("latest", "", 0),
+            ("common word", VOCABULARY[0], 0),
+            ("common word, last page", VOCABULARY[0], last_page),
+            ("two words", f"{VOCABULARY[1]} {VOCABULARY[5]}", 0),
+            ("rare word", VOCABULARY[-1], 0),
+            ("no match", "отсутствует", 0),
+        ]
+        print(f"{'query':>24} {'page':>5} {'p50, ms':>10} {'p95, ms':>10} {'max, ms':>10}")
+        for name, query, page in cases:
+            latencies = await measure(workplace.id, query, page, limit, samples)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:>24} {page:>5} {statistics.median(latencies):>10.2f} {p95:>10.2f} {max(latencies):>10.2f}")
+    finally:
+        await client.drop_database(DATABASE)
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=int, default=100_000)
+    parser.add_argument("--comments", type=int, default=20_000)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.issues, args.comments, args.samples, args.limit))
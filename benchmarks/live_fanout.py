@@ -0,0 +1,114 @@
+"""
+Load test of live event fan-out with thousands of connections on one worker:
+
+    python -m benchmarks.live_fanout --connections 1000 5000 10000 --rate 500 --duration 20
+
+Uses REDIS_URL from .env (a local Redis); MongoDB is not needed. Connections are hub
+subscribers with a consumer that drains its queue the way the WebSocket endpoint does,
+spread over several workplaces and sprints. Events go through Redis pub/sub, so the
+latency includes the round trip to Redis. A share of the connections never reads, and
+they must be dropped without slowing down the others.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import time
+from typing import List
+from uuid import UUID, uuid4
+
+from app.config import live_settings
+from app.core.live import Subscriber, live_hub
+from app.core.redis_session import Redis
+
+
+async def consume(subscriber: Subscriber, latencies: List[float]) -> None:
+    while True:
+        message = await subscriber.next(live_settings.LIVE_HEARTBEAT)
+        if message is None:
+            return
+        if message:
+            latencies.append((time.time() - json.loads(message)["sent"]) * 1000)
+
+
+async def publish(workplaces: List[UUID], sprints: List[List[UUID]], rate: int, duration: float) -> int:
+    redis = Redis()
+    published = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        index = published % len(workplaces)
+        sprint_id = sprints[index][published % len(sprints[index])]
+        event = {"type": "issue.updated", "ids": [str(uuid4())], "sprint_ids": [str(sprint_id)], "sent": time.time()}
+        await redis.publish_live_event(str(workplaces[index]), json.dumps(event))
+        published += 1
+        # равномерный поток событий с заданной частотой
+        await asyncio.sleep(max(started + published / rate - time.perf_counter(), 0))
+    return published
+
+
+async def run(connections: int, workplace_count: int, slow_share: float, rate: int, duration: float) -> None:
+    workplaces = [uuid4() for _ in range(workplace_count)]
+    sprints = [[uuid4() for _ in range(4)] for _ in workplaces]
+    latencies: List[float] = []
+    subscribers = []
+    consumers = []
+    slow = int(connections * slow_share)
+    for i in range(connections):
+        index = i % workplace_count
+        # половина клиентов следит за всем воркплейсом, остальные - за одним спринтом;
+        # нечитающие получают все события воркплейса, чтобы их очередь точно переполнилась
+        sprint_id = None if i < slow or i % 2 == 0 else sprints[index][i % len(sprints[index])]
+        subscriber = live_hub.subscribe(workplaces[index], sprint_id)
+        subscribers.append(subscriber)
+        if i >= slow:
+            consumers.append(asyncio.create_task(consume(subscriber, latencies)))
+
+    published = await publish(workplaces, sprints, rate, duration)
+    # события, ещё идущие через Redis
+    await asyncio.sleep(0.5)
+    dropped = sum(subscriber.overflowed for subscriber in subscribers)
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    for subscriber in subscribers:
+        live_hub.unsubscribe(subscriber)
+
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if len(latencies) < 2:
+        print(f"{connections:>12} no events delivered")
+        return
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(
+        f"{connections:>12} {published / duration:>10.0f} {len(latencies):>10} {statistics.median(latencies):>10.2f}"
+        f" {p95:>10.2f} {max(latencies):>10.2f} {dropped:>8}/{slow:<6} {memory:>10.0f}"
+    )
+
+
+async def main(levels: List[int], workplace_count: int, slow_share: float, rate: int, duration: float) -> None:
+    await Redis.connect_redis()
+    hub = asyncio.create_task(live_hub.run())
+    # подписка на live:* должна успеть установиться до первых событий
+    await asyncio.sleep(0.5)
+    try:
+        print(
+            f"{'connections':>12} {'events/s':>10} {'delivered':>10} {'p50, ms':>10} {'p95, ms':>10}"
+            f" {'max, ms':>10} {'dropped/slow':>15} {'max RSS, MB':>10}"
+        )
+        for connections in sorted(levels):
+            await run(connections, workplace_count, slow_share, rate, duration)
+    finally:
+        hub.cancel()
+        await asyncio.gather(hub, return_exceptions=True)
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--workplaces", type=int, default=10)
+    parser.add_argument("--slow-share", type=float, default=0.01)
+    parser.add_argument("--rate", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.connections, args.workplaces, args.slow_share, args.rate, args.duration))
@@ -0,0 +1,108 @@
+"""
+Login throughput and the latency of an unrelated endpoint while logins are running:
+
+    python -m benchmarks.login_throughput --concurrency 1 8 32 --logins 200
+
+Uses MONGO_URL, REDIS_URL and the HASH_* / BCRYPT_ROUNDS settings from .env. The data is
+written to a separate database that is dropped afterwards. With bcrypt on the hashing pool
+the profile requests should stay fast however many logins are in flight; logins beyond
+the pool queue are rejected with 503 and counted separately.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+from beanie import init_beanie
+
+from app.auth.hash import hasher
+from app.core.exceptions import ServiceUnavailable
+from app.core.mongo_session import MongoManager
+from app.core.redis_session import Redis
+from app.routers.auth import get_user_profile, login
+from app.schemas import __beanie_models__
+from app.schemas.documents import User
+from app.schemas.models.auth import UserLogin
+
+DATABASE = "benchmark_logins"
+PASSWORD = "benchmark-password"
+
+
+async def logins(email: str, count: int, concurrency: int) -> Tuple[List[float], int]:
+    latencies = []
+    rejected = 0
+    remaining = iter(range(count))
+
+    async def client() -> None:
+        nonlocal rejected
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await login(UserLogin(email=email, password=PASSWORD))
+            except ServiceUnavailable:
+                rejected += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, rejected
+
+
+async def probe(user: User, done: asyncio.Event) -> List[float]:
+    """
+    Requests the profile every 10 ms until the logins are finished. The latency is counted
+    from the moment the request was due, so a blocked event loop shows up in it.
+    """
+    latencies = []
+    while not done.is_set():
+        due = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        # как в обработчике: пользователь читается из базы зависимостью get_current_user
+        await get_user_profile(await User.get(user.id))
+        latencies.append((time.perf_counter() - due) * 1000)
+    return latencies
+
+
+async def main(levels: List[int], count: int) -> None:
+    client = MongoManager().get_async_client()
+    await client.drop_database(DATABASE)
+    await init_beanie(database=client[DATABASE], document_models=__beanie_models__)
+    await Redis.connect_redis()
+    try:
+        user = User(email="benchmark@example.com", password=await hasher.hash(PASSWORD), name="Benchmark")
+        await user.insert()
+
+        print(
+            f"{'clients':>8} {'logins/s':>10} {'p50, ms':>10} {'p95, ms':>10} {'503':>6}"
+            f" {'profile p50':>12} {'profile p95':>12} {'profile max':>12}"
+        )
+        for concurrency in sorted(levels):
+            done = asyncio.Event()
+            probing = asyncio.create_task(probe(user, done))
+            started = time.perf_counter()
+            latencies, rejected = await logins(user.email, count, concurrency)
+            elapsed = time.perf_counter() - started
+            done.set()
+            profile = await probing
+            if len(latencies) < 2 or len(profile) < 2:
+                print(f"{concurrency:>8} not enough samples, rejected {rejected}")
+                continue
+            print(
+                f"{concurrency:>8} {len(latencies) / elapsed:>10.1f} {statistics.median(latencies):>10.2f}"
+                f" {statistics.quantiles(latencies, n=20)[-1]:>10.2f} {rejected:>6}"
+                f" {statistics.median(profile):>12.2f} {statistics.quantiles(profile, n=20)[-1]:>12.2f}"
+                f" {max(profile):>12.2f}"
+            )
+    finally:
+        hasher.shutdown()
+        await client.drop_database(DATABASE)
+        await Redis.disconnect_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.logins))
@@ -0,0 +1,16 @@
+import os
+
+# настройки без значений по умолчанию, чтобы app.config импортировался без .env
+for key, value in {
+    "LOGIN_URL": "http://localhost/login",
+    "WORKPLACE_URL": "http://localhost/workplaces",
+    "AUTH_SECRET": "test",
+    "EMAIL_HOST": "127.0.0.1",
+    "EMAIL_PORT": "25",
+    "EMAIL_USERNAME": "test",
+    "EMAIL_PASSWORD": "test",
+    "EMAIL_FROM": "kristi@example.com",
+    "AVATAR_SIZE": "96",
+    "BACKGROUND_COLOR": "#ffffff",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,177 @@
+import json
+import os
+import socket
+
+import fakeredis.aioredis
+import pytest
+import pytest_asyncio
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP
+
+from app.config import email_settings
+from app.core.mailer import MailWorker, SMTPPool
+from app.core.redis_session import Redis
+from app.schemas.models import OutboxMail
+
+
+class Handler:
+    """Accepts every recipient except bad* (550) and busy* (451)."""
+
+    def __init__(self) -> None:
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad"):
+            return "550 No such user"
+        if address.startswith("busy"):
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+class CountingController(Controller):
+    """Counts SMTP sessions opened by the worker."""
+
+    connections = 0
+
+    def factory(self):
+        self.connections += 1
+        return SMTP(self.handler)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    port = free_port()
+    for key, value in {
+        "EMAIL_HOST": "127.0.0.1",
+        "EMAIL_PORT": port,
+        "EMAIL_SSL_TLS": False,
+        "EMAIL_STARTTLS": False,
+        "EMAIL_USE_CREDENTIALS": False,
+        "MAIL_MAX_ATTEMPTS": 3,
+    }.items():
+        monkeypatch.setattr(email_settings, key, value)
+    controller = CountingController(Handler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    # start() сам открывает проверочное соединение
+    controller.connections = 0
+    yield controller
+    controller.stop()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    connection = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(Redis, "con", connection, raising=False)
+    return connection
+
+
+@pytest_asyncio.fixture
+async def worker(smtp, redis):
+    pool = SMTPPool(1)
+    yield MailWorker(pool)
+    await pool.close()
+
+
+async def deliver_outbox(worker: MailWorker) -> None:
+    for raw in await worker.redis.take_mail(worker.worker, email_settings.MAIL_BATCH_SIZE, 0.1):
+        await worker.deliver(raw)
+
+
+def letter(recipient: str, **kwargs) -> OutboxMail:
+    return OutboxMail(recipients=[recipient], subject="Welcome", body="<p>Hi</p>", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_batch_is_sent_over_one_connection(worker, smtp, redis):
+    for i in range(5):
+        await worker.redis.push_mail(letter(f"user{i}@example.com").model_dump_json())
+
+    await deliver_outbox(worker)
+
+    assert sorted(smtp.handler.received) == [f"user{i}@example.com" for i in range(5)]
+    assert smtp.connections == 1
+    assert await redis.llen("mail:outbox") == 0
+    assert await redis.llen(f"mail:processing:{worker.worker}") == 0
+
+
+@pytest.mark.asyncio
+async def test_temporary_failure_is_retried_later(worker, smtp, redis):
+    await worker.redis.push_mail(letter("busy@example.com").model_dump_json())
+
+    await deliver_outbox(worker)
+
+    retries = await redis.zrange("mail:retry", 0, -1, withscores=True)
+    assert len(retries) == 1
+    retry, _ = retries[0]
+    assert json.loads(retry)["attempts"] == 1
+    assert await redis.llen("mail:dead") == 0
+    assert await redis.llen(f"mail:processing:{worker.worker}") == 0
+
+    # письмо возвращается в очередь, когда подходит его время
+    assert await worker.redis.release_due_mail(float("inf")) == 1
+    assert await redis.llen("mail:outbox") == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_failure_goes_to_dead_letters(worker, smtp, redis):
+    await worker.redis.push_mail(letter("bad@example.com").model_dump_json())
+
+    await deliver_outbox(worker)
+
+    dead = [json.loads(raw) for raw in await redis.lrange("mail:dead", 0, -1)]
+    assert [mail["recipients"] for mail in dead] == [["bad@example.com"]]
+    assert await redis.zcard("mail:retry") == 0
+    assert smtp.handler.received == []
+
+
+@pytest.mark.asyncio
+async def test_last_attempt_goes_to_dead_letters(worker, smtp, redis):
+    mail = letter("busy@example.com", attempts=email_settings.MAIL_MAX_ATTEMPTS - 1)
+    await worker.redis.push_mail(mail.model_dump_json())
+
+    await deliver_outbox(worker)
+
+    dead = [json.loads(raw) for raw in await redis.lrange("mail:dead", 0, -1)]
+    assert [mail["attempts"] for mail in dead] == [email_settings.MAIL_MAX_ATTEMPTS]
+    assert await redis.zcard("mail:retry") == 0
+
+
+@pytest.mark.asyncio
+async def test_letters_of_a_crashed_worker_are_restored(worker, smtp, redis):
+    # письмо осталось в списке обработки упавшего воркера
+    await redis.lpush(f"mail:processing:{worker.worker}", letter("orphan@example.com").model_dump_json())
+
+    await worker.redis.restore_processing_mail(worker.worker)
+
+    assert await redis.llen(f"mail:processing:{worker.worker}") == 0
+    assert await redis.llen("mail:outbox") == 1
+    await deliver_outbox(worker)
+    assert smtp.handler.received == ["orphan@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_letters_of_a_silent_worker_are_reclaimed(worker, smtp, redis):
+    await redis.lpush("mail:processing:gone", letter("orphan@example.com").model_dump_json())
+    await worker.redis.beat_mail_worker("gone", 0)
+    await worker.redis.beat_mail_worker(worker.worker, email_settings.MAIL_WORKER_TIMEOUT)
+
+    await worker.reclaim(email_settings.MAIL_WORKER_TIMEOUT + 1)
+
+    assert await redis.llen("mail:processing:gone") == 0
+    assert await redis.llen("mail:outbox") == 1
+    assert await redis.zrange("mail:workers", 0, -1) == [worker.worker]
+
+
+def test_worker_id_is_unique_per_process():
+    assert type(email_settings)(_env_file=None).MAIL_WORKER_ID.endswith(f"-{os.getpid()}")